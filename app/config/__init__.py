@@ -3,24 +3,36 @@ from .settings import (
     PORT,
     HOST,
     BASE_URL,
+    SOCRATA_APP_TOKEN,
+    SOCRATA_PAGE_SIZE,
     CORS_ORIGINS_ENV,
     ALLOWED_ORIGINS,
     LOG_LEVEL,
     GROQ_API_KEY,
     RUTA_ARTEFACTOS,
     ENABLE_EMBEDDINGS,
-    EMBEDDING_MODEL
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_FILE,
+    EMBEDDING_CACHE_SIZE,
+    TORCH_NUM_THREADS
 )
 
 __all__ = [
     "PORT",
     "HOST",
     "BASE_URL",
+    "SOCRATA_APP_TOKEN",
+    "SOCRATA_PAGE_SIZE",
     "CORS_ORIGINS_ENV",
     "ALLOWED_ORIGINS",
     "LOG_LEVEL",
     "GROQ_API_KEY",
     "RUTA_ARTEFACTOS",
     "ENABLE_EMBEDDINGS",
-    "EMBEDDING_MODEL"
+    "EMBEDDING_MODEL",
+    "EMBEDDING_BACKEND",
+    "EMBEDDING_ONNX_FILE",
+    "EMBEDDING_CACHE_SIZE",
+    "TORCH_NUM_THREADS"
 ]
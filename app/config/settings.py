@@ -18,6 +18,14 @@ HOST = os.getenv("HOST", "0.0.0.0")
 # =====================================
 BASE_URL = os.getenv("BASE_URL", "https://www.datos.gov.co/resource/jbjy-vk9h.json")
 
+# App token de Socrata (opcional): evita el throttling compartido de peticiones anónimas
+# Se obtiene en https://www.datos.gov.co/profile/edit/developer_settings
+SOCRATA_APP_TOKEN = os.getenv("SOCRATA_APP_TOKEN", None)
+
+# Tamaño de página para consultas paralelas del listado ($offset por página sobre la misma conexión).
+# 0 (por defecto) desactiva la paginación: una sola consulta con $limit
+SOCRATA_PAGE_SIZE = int(os.getenv("SOCRATA_PAGE_SIZE", 0))
+
 # =====================================
 # Configuración del Motor de Análisis
 # =====================================
@@ -70,9 +78,25 @@ EMBEDDING_MODEL = os.getenv(
     "paraphrase-multilingual-MiniLM-L12-v2"  # Modelo ligero por defecto
 )
 
+# Backend de inferencia de embeddings:
+#   - 'torch' (por defecto): modelo original en fp32
+#   - 'onnx': ONNX Runtime (requiere optimum[onnxruntime]); con un archivo cuantizado
+#     int8 es 2-4x más rápido en CPU. Si falla la carga se usa 'torch' automáticamente.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+
+# Archivo ONNX dentro del repositorio del modelo (solo si EMBEDDING_BACKEND=onnx)
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+
+# Embeddings en la caché LRU en memoria (~1.5KB c/u con 384 dimensiones float32)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 4096))
+
+# Hilos de torch para embeddings (backend torch); 4 suele ser el óptimo en CPU
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", min(4, os.cpu_count() or 1)))
+
 print(f"🧠 Embeddings habilitados: {ENABLE_EMBEDDINGS}")
 if ENABLE_EMBEDDINGS:
     print(f"   Modelo: {EMBEDDING_MODEL}")
+    print(f"   Backend: {EMBEDDING_BACKEND}")
 
 # =====================================
 # Configuración CORS
@@ -2,16 +2,27 @@
 Controllers para endpoints de contratos gubernamentales.
 """
 import logging
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Header, Query, HTTPException
 from typing import Optional
+from cachetools import TTLCache
 
 from app.models import ContratosResponseModel, ContratoAnalisisResponseModel, MetadataModel
 from app.services import ContractService
+from app.utils import soql_literal, soql_where_eq
 from app.constants import CONTRATOS_DESCRIPTION, ANALISIS_DESCRIPTION
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Análisis de Contratos"])
 
+# Respuestas completas de /contratos por combinación de filtros (5 min).
+# La ruta es async y solo se accede desde el event loop, por lo que no requiere lock.
+_RESPUESTAS_CACHE: TTLCache = TTLCache(maxsize=512, ttl=300)
+
+
+def _forzar_refresco(cache_control: Optional[str]) -> bool:
+    """Indica si el cliente pidió ignorar los cachés (`Cache-Control: no-cache`)."""
+    return bool(cache_control) and "no-cache" in cache_control.lower()
+
 
 @router.get(
     "/contratos",
@@ -20,7 +31,7 @@ router = APIRouter(tags=["Análisis de Contratos"])
     description=CONTRATOS_DESCRIPTION,
     response_description="Lista de contratos con métricas agregadas y análisis de riesgo"
 )
-def obtener_contratos(
+async def obtener_contratos(
     fecha_desde: Optional[str] = Query(
         None,
         regex=r"^\d{4}-\d{2}-\d{2}$",
@@ -55,7 +66,8 @@ def obtener_contratos(
         None,
         description="Búsqueda por ID específico del contrato. Ejemplo: 'ABC-2024-001'",
         example="ABC-2024-001"
-    )
+    ),
+    cache_control: Optional[str] = Header(None, include_in_schema=False)
 ):
     """Obtiene lista de contratos con análisis rápido de muestra.
     
@@ -70,10 +82,19 @@ def obtener_contratos(
         valor_maximo: Valor máximo del contrato
         nombre_contrato: Nombre de la entidad contratante
         id_contrato: ID específico del contrato
+        cache_control: Cabecera Cache-Control (`no-cache` fuerza consulta a la API)
         
     Returns:
         ContratosResponseModel: Respuesta con métricas de muestra y lista de 10 contratos
     """
+    # Respuesta en caché para filtros repetidos (no aplica a búsquedas por ID ni a no-cache)
+    usar_cache = not id_contrato and not _forzar_refresco(cache_control)
+    cache_key = (fecha_desde, fecha_hasta, valor_minimo, valor_maximo, nombre_contrato)
+    if usar_cache:
+        respuesta_cached = _RESPUESTAS_CACHE.get(cache_key)
+        if respuesta_cached is not None:
+            return respuesta_cached
+    
     # Construir cláusula WHERE dinámica
     filtros = [
         "fecha_de_inicio_del_contrato is not null",
@@ -82,27 +103,29 @@ def obtener_contratos(
     ]
     
     if fecha_desde:
-        filtros.append(f"fecha_de_inicio_del_contrato >= '{fecha_desde}'")
+        filtros.append(f"fecha_de_inicio_del_contrato >= {soql_literal(fecha_desde)}")
     if fecha_hasta:
-        filtros.append(f"fecha_de_inicio_del_contrato <= '{fecha_hasta}'")
+        filtros.append(f"fecha_de_inicio_del_contrato <= {soql_literal(fecha_hasta)}")
     if valor_minimo is not None:
         filtros.append(f"valor_del_contrato >= {valor_minimo}")
     if valor_maximo is not None:
         filtros.append(f"valor_del_contrato <= {valor_maximo}")
     if nombre_contrato:
-        filtros.append(f"nombre_entidad like '%{nombre_contrato}%'")
+        filtros.append(f"nombre_entidad like {soql_literal(f'%{nombre_contrato}%')}")
     if id_contrato:
-        filtros.append(f"id_contrato = '{id_contrato}'")
+        filtros.append(soql_where_eq("id_contrato", id_contrato))
     
     where_clause = " AND ".join(filtros)
     
     # Obtener datos del servicio (modo muestra rápida)
     # Solo analiza los primeros 10 contratos que cumplan filtros
     total_contratos, monto_total, contratos_alto_riesgo, contratos_mapeados = \
-        ContractService.obtener_contratos_filtrados(where_clause)
+        await ContractService.obtener_contratos_filtrados(
+            where_clause, forzar_refresco=_forzar_refresco(cache_control)
+        )
     
     # Construir respuesta
-    return ContratosResponseModel(
+    respuesta = ContratosResponseModel(
         metadata=MetadataModel(
             fuenteDatos="datos.gov.co (SECOP II - Sistema Electrónico de Contratación Pública)",
             camposSimulados=[
@@ -114,6 +137,11 @@ def obtener_contratos(
         montoTotalCOP=round(monto_total, 2),
         contratos=contratos_mapeados
     )
+    
+    if usar_cache:
+        _RESPUESTAS_CACHE[cache_key] = respuesta
+    
+    return respuesta
 
 
 @router.get(
@@ -123,21 +151,29 @@ def obtener_contratos(
     description=ANALISIS_DESCRIPTION,
     response_description="Análisis detallado del contrato con explicabilidad del modelo"
 )
-def obtener_analisis_contrato(id: str):
+async def obtener_analisis_contrato(
+    id: str,
+    background_tasks: BackgroundTasks,
+    cache_control: Optional[str] = Header(None, include_in_schema=False)
+):
     """Obtiene el análisis detallado de un contrato específico.
     
     Args:
         id: ID único del contrato a analizar
+        background_tasks: Tareas de fondo para guardar el análisis en caché
+        cache_control: Cabecera Cache-Control (`no-cache` fuerza consulta a la API)
         
     Returns:
         ContratoAnalisisResponseModel: Datos del contrato y análisis completo
     """
     try:
         # Obtener datos del contrato
-        contrato = ContractService.obtener_contrato_por_id(id)
+        contrato = await ContractService.obtener_contrato_por_id(id, _forzar_refresco(cache_control))
         
         # Generar análisis
-        contract_data, analysis_data = ContractService.generar_analisis_contrato(id, contrato)
+        contract_data, analysis_data = await ContractService.generar_analisis_contrato(
+            id, contrato, background_tasks=background_tasks
+        )
         
         # Construir respuesta
         return ContratoAnalisisResponseModel(
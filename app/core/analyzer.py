@@ -1,28 +1,132 @@
+import asyncio
 import joblib
-import json
+import orjson
 import numpy as np
-import pandas as pd
 import re
 import time
 import os
-from groq import Groq
+import random
+import threading
+import warnings
+from hashlib import blake2b
+from cachetools import LRUCache
+from groq import AsyncGroq, Groq
 from sentence_transformers import SentenceTransformer
 
+# El IsolationForest se entrenó con un DataFrame; la inferencia recibe el ndarray en el mismo orden de columnas
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+# Modelos de embeddings compartidos por todas las instancias del motor (una carga por proceso)
+_MODELOS_NLP = {}
+_MODELOS_NLP_LOCK = threading.Lock()
+
+# Objeto JSON embebido en texto libre (respaldo si la respuesta del LLM trae texto alrededor)
+_JSON_OBJETO_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# Plantillas del prompt de análisis (sin sangría: los espacios iniciales también son tokens de entrada)
+_ROL_BAJO = "Eres un Auditor de Calidad validando un proceso correcto."
+_ROL_SOSPECHOSO = "Eres un Auditor Forense experto en detección de fraude."
+
+_INSTRUCCION_BAJO = """El análisis matemático confirma que este contrato es NORMAL (Riesgo Bajo: {riesgo:.0%}).
+
+TAREA:
+Escribe un reporte corto confirmando la regularidad del contrato.
+- Resumen: Indica que el monto (${valor:,.0f}) y el objeto son consistentes con el histórico de la entidad.
+- Factores: Menciona "Monto dentro del promedio" y "Descripción clara".
+- Recomendaciones: Sugiere "Archivar expediente" o "Continuar trámite".
+
+TONO: Tranquilizador, profesional, de visto bueno."""
+
+_INSTRUCCION_SOSPECHOSO = """ALERTA: El sistema detectó RIESGO {nivel} ({riesgo:.0%}).
+
+EVIDENCIA:
+1. Score Financiero (ML): {score_ml:.0%}
+2. Score Semántico (Texto): {score_nlp:.0%}
+3. Desviación Precio (Z-Score): {z_score:.1f}x veces el promedio.
+{txt_shap}
+
+TAREA:
+Explica las anomalías detectadas.
+- Resumen: Enfócate en por qué el monto no cuadra con el objeto.
+- Factores: Lista qué variables matemáticas dispararon la alerta.
+- Recomendaciones: Sugiere auditorías específicas (fiscal, precios, jurídica).
+
+TONO: Alerta, crítico, preventivo."""
+
+_PROMPT_ANALISIS = """{rol}
+
+DATOS:
+- Objeto: "{objeto}"
+- Valor: ${valor:,.0f}
+
+{instruccion}
+
+SALIDA JSON OBLIGATORIA:
+{{
+    "resumen": "Texto...",
+    "factores": ["Texto...", "Texto..."],
+    "recomendaciones": ["Texto...", "Texto..."]
+}}"""
+
+# Reintentos ante rate limit de Groq: backoff exponencial con jitter (base * 2^intento + U(0, base))
+_GROQ_INTENTOS = 3
+_GROQ_BACKOFF_BASE = 2.0
+
+
+class _LimitadorTasa:
+    """Token bucket compartido por hilos y corrutinas.
+    
+    `reservar()` consume un turno y devuelve los segundos a esperar antes de usarlo;
+    así las llamadas se encolan antes de llegar a la API en lugar de recibir un 429.
+    """
+    
+    def __init__(self, capacidad, periodo_segundos):
+        self._capacidad = float(capacidad)
+        self._intervalo = periodo_segundos / capacidad
+        self._tokens = float(capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reservar(self):
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self._capacidad, self._tokens + (ahora - self._ultimo) / self._intervalo)
+            self._ultimo = ahora
+            self._tokens -= 1.0
+            # Tokens negativos = turnos ya reservados por delante
+            return 0.0 if self._tokens >= 0 else -self._tokens * self._intervalo
+
+
+# Free tier de Groq: 30 req/min por API key (límite del proceso, no por instancia del motor)
+_LIMITADOR_GROQ = _LimitadorTasa(30, 60.0)
+
 class RadarColInferencia:
-    def __init__(self, groq_api_key=None, ruta_artefactos="data/artifacts"):
+    def __init__(self, groq_api_key=None, ruta_artefactos="data/artifacts", cache_llm=None):
         print("⚙️ Inicializando Motor RadarCol (Groq + ML)...")
         
         # 1. Configuración Groq LLM
         self.usar_llm = False
         self.client = None
+        self.client_async = None  # Mismo servicio, para los endpoints async (no bloquea hilos en la espera)
         self.model_name = "llama-3.1-8b-instant"  # Modelo rápido y eficiente
+        # Parámetros fijos de cada llamada; JSON mode obliga a Groq a devolver un objeto JSON válido
+        self._parametros_llm = {
+            "model": self.model_name,
+            "temperature": 0.1,  # Respuestas consistentes
+            "max_tokens": 1000,  # Límite para análisis
+            "response_format": {"type": "json_object"}
+        }
+        # Caché persistente de respuestas (get_respuesta_llm / save_respuesta_llm), opcional
+        self.cache_llm = cache_llm
         
         try:
             # Si pasas la key explícita o está en variables de entorno
             if groq_api_key:
                 self.client = Groq(api_key=groq_api_key)
+                self.client_async = AsyncGroq(api_key=groq_api_key)
             else:
                 self.client = Groq()  # Busca GROQ_API_KEY en env
+                self.client_async = AsyncGroq()
             
             self.usar_llm = True
             print(f"   ✨ Cliente Groq conectado ({self.model_name})")
@@ -41,9 +145,14 @@ class RadarColInferencia:
                 raise FileNotFoundError(f"Directorio de artefactos no encontrado: {ruta_artefactos}")
             
             self.iso_forest = joblib.load(f"{ruta_artefactos}/modelo_isoforest.pkl")
-            self.centroide = np.load(f"{ruta_artefactos}/centroide_semantico.npy")
-            with open(f"{ruta_artefactos}/stats_entidades.json", 'r') as f:
-                self.stats_entidades = json.load(f)
+            self._arboles_if = self._preparar_arboles_if()
+            # Solo lectura y mapeado en memoria: procesos que cargan el mismo archivo comparten las páginas
+            self.centroide = np.load(f"{ruta_artefactos}/centroide_semantico.npy", mmap_mode="r")
+            # Vista float32 contigua (el .npy ya es float32: comparte el mmap, sin copia) y norma² precalculada
+            self._centroide32 = np.ascontiguousarray(self.centroide, dtype=np.float32)
+            self._centroide_norma2 = float(self.centroide @ self.centroide)
+            with open(f"{ruta_artefactos}/stats_entidades.json", 'rb') as f:
+                self._construir_indice_stats(orjson.loads(f.read()))
             
             # SHAP
             try:
@@ -62,33 +171,45 @@ class RadarColInferencia:
             # Modo degradado: usar valores por defecto
             self.modo_solo_llm = True
             self.iso_forest = None
-            self.stats_entidades = {
-                # Estadísticas por defecto para entidades comunes
-                "default": {"media": 50000000, "std": 20000000}
-            }
+            self._arboles_if = None
+            self._centroide32 = None
+            # Estadísticas por defecto para todas las entidades
+            self._construir_indice_stats({})
             self.usar_shap = False
 
         # 3. NLP - Carga condicional basada en configuración
         self.model_nlp = None
+        self._emb_lock = threading.Lock()
         
         # Importar configuración de embeddings
         try:
-            from app.config import ENABLE_EMBEDDINGS, EMBEDDING_MODEL
+            from app.config import (
+                ENABLE_EMBEDDINGS, EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_ONNX_FILE, EMBEDDING_CACHE_SIZE,
+                TORCH_NUM_THREADS
+            )
             self.enable_embeddings = ENABLE_EMBEDDINGS
             self.embedding_model_name = EMBEDDING_MODEL
+            self.embedding_backend = EMBEDDING_BACKEND
+            self.embedding_onnx_file = EMBEDDING_ONNX_FILE
+            self.embedding_cache_size = EMBEDDING_CACHE_SIZE
+            self.torch_num_threads = TORCH_NUM_THREADS
         except ImportError:
             # Valores por defecto si no hay configuración
             self.enable_embeddings = False
             self.embedding_model_name = "paraphrase-multilingual-MiniLM-L12-v2"
+            self.embedding_backend = "torch"
+            self.embedding_onnx_file = None
+            self.embedding_cache_size = 4096
+            self.torch_num_threads = min(4, os.cpu_count() or 1)
+        
+        # Caché LRU de embeddings por hash del texto truncado (descripciones repetidas no re-codifican)
+        self._emb_cache = LRUCache(maxsize=max(1, self.embedding_cache_size))
         
         if self.enable_embeddings:
             try:
                 print(f"   🧠 Cargando embeddings: {self.embedding_model_name}")
                 print("   ⏱️  Esto puede tomar 10-30 segundos...")
-                self.model_nlp = SentenceTransformer(
-                    self.embedding_model_name, 
-                    device="cpu"
-                )
+                self.model_nlp = self._cargar_modelo_nlp()
                 print(f"   ✅ Embeddings cargados correctamente")
             except Exception as e:
                 print(f"   ⚠️ Error cargando embeddings: {e}")
@@ -105,135 +226,293 @@ class RadarColInferencia:
             "Duracion Dias", "Dias tras Firma", "Anio Firma", "Mes Firma"
         ]
 
+    def _cargar_modelo_nlp(self):
+        """Obtiene el SentenceTransformer compartido del proceso; la primera vez lo carga y lo precalienta."""
+        clave = (self.embedding_model_name, self.embedding_backend, self.embedding_onnx_file)
+        with _MODELOS_NLP_LOCK:
+            modelo = _MODELOS_NLP.get(clave)
+            if modelo is None:
+                modelo = self._construir_modelo_nlp()
+                # La primera codificación inicializa kernels y buffers: se paga aquí y no en una petición
+                modelo.encode(["precalentamiento"], show_progress_bar=False)
+                _MODELOS_NLP[clave] = modelo
+        return modelo
+    
+    def _configurar_hilos_torch(self):
+        """Fija los hilos de torch; en CPUs compartidas más hilos solo agregan contención."""
+        try:
+            import torch
+        except ImportError:
+            return
+        torch.set_num_threads(self.torch_num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Solo se puede fijar antes del primer trabajo paralelo
+    
+    def _construir_modelo_nlp(self):
+        """Carga el SentenceTransformer; con backend 'onnx' usa ONNX Runtime int8 y cae a torch si falla."""
+        if self.embedding_backend == "onnx":
+            try:
+                modelo = SentenceTransformer(
+                    self.embedding_model_name,
+                    device="cpu",
+                    backend="onnx",
+                    model_kwargs={"file_name": self.embedding_onnx_file}
+                )
+                print(f"   ⚡ Embeddings con ONNX Runtime ({self.embedding_onnx_file})")
+                return modelo
+            except Exception as e:
+                print(f"   ⚠️ Backend ONNX no disponible ({e}). Usando torch.")
+        
+        self._configurar_hilos_torch()
+        return SentenceTransformer(
+            self.embedding_model_name, 
+            device="cpu"
+        )
+
+    def _construir_indice_stats(self, stats_entidades):
+        """Convierte stats por NIT (dict de dicts) a arrays contiguos (SoA) indexados por NIT.
+        
+        La fila 0 es el fallback ("default" si existe); las desviaciones no positivas se
+        reemplazan por 1.0 al construir, para no repetir esa validación por contrato.
+        Se guarda el inverso de la desviación: el z-score queda como una resta y un producto.
+        """
+        fallback_stats = {"media": 50000000, "std": 20000000}
+        if self.modo_solo_llm:
+            stats_entidades = {}
+        filas = [stats_entidades.get("default", fallback_stats)]
+        self._nit_index = {}
+        for nit, stats in stats_entidades.items():
+            self._nit_index[nit] = len(filas)
+            filas.append(stats)
+        
+        self._stats_medias = np.array([f["media"] for f in filas], dtype=np.float64)
+        stds = np.array([f["std"] for f in filas], dtype=np.float64)
+        self._stats_inv_stds = 1.0 / np.where(stds > 0, stds, 1.0)
+
+    def _stats_lookup(self, nits):
+        """Retorna (medias, 1/stds) de las entidades de un lote con indexado vectorizado."""
+        idx = np.fromiter((self._nit_index.get(nit, 0) for nit in nits), dtype=np.intp, count=len(nits))
+        return self._stats_medias[idx], self._stats_inv_stds[idx]
+    
+    def _preparar_arboles_if(self):
+        """Tablas por árbol para puntuar el IsolationForest sin la validación de sklearn.
+        
+        `decision_function` valida la entrada y cada árbol (check_is_fitted, n_features)
+        en cada llamada; con 1 fila eso domina el tiempo. Aquí se guarda por árbol su
+        `tree_` (Cython), las columnas que usa y la profundidad efectiva de cada hoja.
+        Devuelve None si la versión de sklearn no expone esos atributos o si el
+        resultado no coincide con `decision_function` (se usa la ruta estándar).
+        """
+        try:
+            from sklearn.ensemble._iforest import _average_path_length
+            
+            modelo = self.iso_forest
+            n_features = modelo.n_features_in_
+            arboles = []
+            for estimador, features, caminos, promedios in zip(
+                modelo.estimators_, modelo.estimators_features_,
+                modelo._decision_path_lengths, modelo._average_path_length_per_tree
+            ):
+                columnas = None if modelo._max_features == n_features else np.asarray(features)
+                arboles.append((estimador.tree_, columnas, caminos + promedios - 1.0))
+            denominador = len(arboles) * float(_average_path_length([modelo._max_samples])[0])
+            if not arboles or denominador == 0:
+                return None
+            self._denominador_if = denominador
+            
+            # Verificación contra sklearn con filas de prueba
+            prueba = np.random.default_rng(0).normal(0, 3, size=(8, n_features)) * np.logspace(0, 9, n_features)
+            self._arboles_if = arboles
+            if not np.allclose(self._decision_if(prueba), modelo.decision_function(prueba), rtol=0, atol=1e-12):
+                return None
+            return arboles
+        except Exception:
+            return None
+    
+    def _decision_if(self, X):
+        """Equivalente a `iso_forest.decision_function(X)` recorriendo directamente los árboles.
+        
+        `_analizar_matriz` solo pasa filas finitas (las filas con NaN/inf usan el fallback z-score).
+        """
+        # Sin tablas: ruta estándar. Con NaN/inf (no debería ocurrir): sklearn lanza ValueError
+        if not self._arboles_if or not np.isfinite(X).all():
+            return self.iso_forest.decision_function(X)
+        # Los árboles de sklearn trabajan en float32 C-contiguo (misma conversión que hace check_array)
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        profundidades = np.zeros(len(X32))
+        for arbol, columnas, profundidad_hoja in self._arboles_if:
+            X_arbol = X32 if columnas is None else np.ascontiguousarray(X32[:, columnas])
+            profundidades += profundidad_hoja[arbol.apply(X_arbol)]
+        return -(2.0 ** (-profundidades / self._denominador_if)) - self.iso_forest.offset_
+
+    def _embeddings(self, textos):
+        """Embeddings normalizados (N x d, float32) de texto[:200], con caché LRU por hash blake2b.
+        
+        Los textos que no están en caché se codifican juntos en una sola llamada por lotes.
+        """
+        textos = [t[:200] for t in textos]
+        keys = [blake2b(t.encode("utf-8"), digest_size=16).digest() for t in textos]
+        with self._emb_lock:
+            embs = [self._emb_cache.get(k) for k in keys]
+        
+        # Codificar una sola vez cada texto faltante (deduplicado por llave)
+        faltantes = {k: t for k, t, e in zip(keys, textos, embs) if e is None}
+        if faltantes:
+            nuevos = self.model_nlp.encode(
+                list(faltantes.values()), 
+                batch_size=32,
+                convert_to_numpy=True, 
+                show_progress_bar=False, 
+                normalize_embeddings=True
+            ).astype(np.float32, copy=False)
+            nuevos = dict(zip(faltantes, nuevos))
+            with self._emb_lock:
+                self._emb_cache.update(nuevos)
+            embs = [nuevos[k] if e is None else e for k, e in zip(keys, embs)]
+        
+        return np.stack(embs)
+
+    def _preprocesar_batch(self, contratos):
+        """Construye la matriz de features (N x 9, ndarray float64) de un lote de contratos en una sola pasada.
+        
+        Las columnas siguen el orden de `self.columnas_modelo`; sin DataFrame intermedio
+        (el modelo recibe el ndarray directamente).
+        """
+        n = len(contratos)
+        valores = np.fromiter((float(c.get("Valor del Contrato", 0)) for c in contratos), dtype=np.float64, count=n)
+        objetos = [c.get("Objeto del Contrato", "Sin descripción") for c in contratos]
+        longitudes = np.fromiter((len(o) for o in objetos), dtype=np.float64, count=n)
+        
+        # Obtener estadísticas de entidad (modo degradado: todas usan la fila por defecto)
+        medias, inv_stds = self._stats_lookup([c.get("Nit Entidad", "0") for c in contratos])
+        
+        X = np.empty((n, len(self.columnas_modelo)), dtype=np.float64)
+        X[:, 0] = (valores - medias) * inv_stds                                  # Z-Score Valor
+        X[:, 1] = np.log1p(valores)                                              # Valor Logaritmo
+        X[:, 2] = valores / (longitudes + 1)                                     # Costo por Caracter
+        X[:, 3] = [float(c.get("Indice Dependencia", 0)) for c in contratos]     # Indice Dependencia Proveedor
+        X[:, 4] = 0.0                                                            # Pct Tiempo Adicionado
+        X[:, 5] = [float(c.get("Duracion Dias", 0)) for c in contratos]          # Duracion Dias
+        X[:, 6] = 0.0                                                            # Dias tras Firma
+        X[:, 7] = [c.get("Anio Firma", 2025) for c in contratos]                 # Anio Firma
+        X[:, 8] = [c.get("Mes Firma", 1) for c in contratos]                     # Mes Firma
+        return X, objetos
+
     def _preprocesar(self, contrato):
-        valor = float(contrato.get("Valor del Contrato", 0))
-        objeto = contrato.get("Objeto del Contrato", "Sin descripción")
-        nit = contrato.get("Nit Entidad", "0")
-        duracion = float(contrato.get("Duracion Dias", 0))
-        
-        # Obtener estadísticas de entidad
-        if self.modo_solo_llm or not self.stats_entidades:
-            # Modo degradado: usar estadísticas por defecto
-            fallback_stats = {"media": 50000000, "std": 20000000}
-            stats = fallback_stats
-        else:
-            fallback_stats = {"media": 50000000, "std": 20000000}
-            stats = self.stats_entidades.get(nit, 
-                    self.stats_entidades.get("default", fallback_stats))
-        
-        std = stats['std'] if stats['std'] > 0 else 1.0
-        z_score = (valor - stats['media']) / std
-        
-        features = {
-            "Z-Score Valor": z_score,
-            "Valor Logaritmo": np.log(valor + 1),
-            "Costo por Caracter": valor / (len(objeto) + 1),
-            "Indice Dependencia Proveedor": float(contrato.get("Indice Dependencia", 0)),
-            "Pct Tiempo Adicionado": 0.0,
-            "Duracion Dias": duracion,
-            "Dias tras Firma": 0,
-            "Anio Firma": contrato.get("Anio Firma", 2025),
-            "Mes Firma": contrato.get("Mes Firma", 1)
-        }
-        return pd.DataFrame([features])[self.columnas_modelo], objeto, features
+        X, objetos = self._preprocesar_batch([contrato])
+        return X, objetos[0], dict(zip(self.columnas_modelo, X[0].tolist()))
 
     def _limpiar_json_llm(self, texto):
-        """Usa Regex para extraer JSON válido de cualquier respuesta."""
+        """Parsea la respuesta JSON; si trae texto alrededor, extrae el objeto con Regex."""
         try:
-            match = re.search(r'\{.*\}', texto, re.DOTALL)
-            if match: return json.loads(match.group())
-            return json.loads(texto)
-        except: return None
+            return orjson.loads(texto)
+        except orjson.JSONDecodeError:
+            pass
+        try:
+            match = _JSON_OBJETO_RE.search(texto)
+            if match: return orjson.loads(match.group())
+        except: pass
+        return None
 
+    def _espera_reintento(self, error, intento):
+        """Segundos a esperar antes de reintentar, o None si el error no es un rate limit."""
+        err = str(error)
+        if "429" not in err and "rate" not in err.lower():
+            return None
+        espera = _GROQ_BACKOFF_BASE * (2 ** intento)
+        # Groq indica en Retry-After cuándo vuelve a haber cupo
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            espera = max(espera, float(headers.get("retry-after", 0)))
+        except (TypeError, ValueError):
+            pass
+        return espera + random.uniform(0, _GROQ_BACKOFF_BASE)
+    
     def _generar_con_retry(self, prompt):
-        """Llama a Groq API con reintentos automáticos."""
-        for i in range(3):
+        """Llama a Groq API con límite de tasa y reintentos con backoff exponencial."""
+        for i in range(_GROQ_INTENTOS):
+            time.sleep(_LIMITADOR_GROQ.reservar())
             try:
                 response = self.client.chat.completions.create(
-                    model=self.model_name,
                     messages=[
                         {"role": "user", "content": prompt}
                     ],
-                    temperature=0.1,  # Respuestas consistentes
-                    max_tokens=1000   # Límite para análisis
+                    **self._parametros_llm
                 )
                 return response.choices[0].message.content
             except Exception as e:
-                err = str(e)
-                if "429" in err or "rate" in err.lower():
-                    wait_time = 12 + (i * 8)  # Espera progresiva para rate limits
-                    print(f"   ⏳ Rate limit, esperando {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"   ❌ Error Groq API: {err}")
+                wait_time = self._espera_reintento(e, i)
+                if wait_time is None:
+                    print(f"   ❌ Error Groq API: {e}")
                     break
+                if i + 1 < _GROQ_INTENTOS:
+                    print(f"   ⏳ Rate limit, esperando {wait_time:.1f}s...")
+                    time.sleep(wait_time)
         return None
 
-    def _generar_analisis_ia(self, contrato, riesgo, nivel, features, shap_values, score_ml, score_nlp):
+    async def _generar_con_retry_async(self, prompt):
+        """Versión async de `_generar_con_retry` (AsyncGroq; las esperas no ocupan un hilo)."""
+        for i in range(_GROQ_INTENTOS):
+            await asyncio.sleep(_LIMITADOR_GROQ.reservar())
+            try:
+                response = await self.client_async.chat.completions.create(
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    **self._parametros_llm
+                )
+                return response.choices[0].message.content
+            except Exception as e:
+                wait_time = self._espera_reintento(e, i)
+                if wait_time is None:
+                    print(f"   ❌ Error Groq API: {e}")
+                    break
+                if i + 1 < _GROQ_INTENTOS:
+                    print(f"   ⏳ Rate limit, esperando {wait_time:.1f}s...")
+                    await asyncio.sleep(wait_time)
+        return None
+    
+    def _clave_llm(self, prompt):
+        """Hash del prompt completo y del modelo.
+        
+        La respuesta cita los valores exactos del prompt (monto, porcentajes, SHAP),
+        así que solo se reutiliza para un prompt idéntico.
+        """
+        entrada = orjson.dumps([self.model_name, prompt])
+        return blake2b(entrada, digest_size=16).hexdigest()
+    
+    def _construir_prompt(self, contrato, riesgo, nivel, features, shap_values, score_ml, score_nlp):
         
         # --- LÓGICA DE PERSONALIDAD ADAPTATIVA ---
+        valor = contrato.get("Valor del Contrato", 0)
         
         # CASO 1: Contrato Normal (BAJO RIESGO)
         if nivel == "BAJO":
-            rol = "Eres un Auditor de Calidad validando un proceso correcto."
-            instruccion = f"""
-            El análisis matemático confirma que este contrato es NORMAL (Riesgo Bajo: {riesgo:.0%}).
-            
-            TAREA:
-            Escribe un reporte corto confirmando la regularidad del contrato.
-            - Resumen: Indica que el monto (${contrato.get('Valor del Contrato',0):,.0f}) y el objeto son consistentes con el histórico de la entidad.
-            - Factores: Menciona "Monto dentro del promedio" y "Descripción clara".
-            - Recomendaciones: Sugiere "Archivar expediente" o "Continuar trámite".
-            
-            TONO: Tranquilizador, profesional, de visto bueno.
-            """
+            rol = _ROL_BAJO
+            instruccion = _INSTRUCCION_BAJO.format(riesgo=riesgo, valor=valor)
             
         # CASO 2: Contrato Sospechoso (MEDIO / ALTO / CRÍTICO)
         else:
-            rol = "Eres un Auditor Forense experto en detección de fraude."
+            rol = _ROL_SOSPECHOSO
             
             # Preparamos evidencia para el prompt
             txt_shap = ""
             if shap_values:
-                top_3 = shap_values[:3]
-                txt_shap = "Variables clave:\n" + "\n".join([f"- {i['variable']} (Valor: {i['valor']})" for i in top_3])
-
-            instruccion = f"""
-            ALERTA: El sistema detectó RIESGO {nivel} ({riesgo:.0%}).
-            
-            EVIDENCIA:
-            1. Score Financiero (ML): {score_ml:.0%}
-            2. Score Semántico (Texto): {score_nlp:.0%}
-            3. Desviación Precio (Z-Score): {features['Z-Score Valor']:.1f}x veces el promedio.
-            {txt_shap}
+                txt_shap = "Variables clave:\n" + "\n".join([f"- {i['variable']} (Valor: {i['valor']})" for i in shap_values[:3]])
             
-            TAREA:
-            Explica las anomalías detectadas.
-            - Resumen: Enfócate en por qué el monto no cuadra con el objeto.
-            - Factores: Lista qué variables matemáticas dispararon la alerta.
-            - Recomendaciones: Sugiere auditorías específicas (fiscal, precios, jurídica).
-            
-            TONO: Alerta, crítico, preventivo.
-            """
-
-        prompt = f"""
-        {rol}
+            instruccion = _INSTRUCCION_SOSPECHOSO.format(
+                nivel=nivel, riesgo=riesgo, score_ml=score_ml, score_nlp=score_nlp,
+                z_score=features["Z-Score Valor"], txt_shap=txt_shap
+            )
         
-        DATOS:
-        - Objeto: "{contrato.get('Objeto del Contrato')}"
-        - Valor: ${contrato.get('Valor del Contrato', 0):,.0f}
-        
-        {instruccion}
-
-        SALIDA JSON OBLIGATORIA:
-        {{
-            "resumen": "Texto...",
-            "factores": ["Texto...", "Texto..."],
-            "recomendaciones": ["Texto...", "Texto..."]
-        }}
-        """
-        
-        raw = self._generar_con_retry(prompt)
+        return _PROMPT_ANALISIS.format(
+            rol=rol, objeto=contrato.get("Objeto del Contrato"), valor=valor, instruccion=instruccion
+        )
+    
+    def _parsear_respuesta_llm(self, raw):
+        """Convierte la respuesta cruda de Groq al dict de análisis (None si no es válida)."""
         if raw:
             data = self._limpiar_json_llm(raw)
             if data: 
@@ -241,118 +520,187 @@ class RadarColInferencia:
                 data["factores"] = [str(x) for x in data.get("factores", [])]
                 data["recomendaciones"] = [str(x) for x in data.get("recomendaciones", [])]
                 return data
+        return None
 
+    def _analisis_llm_fallback(self):
         # Fallback de emergencia
         return {
             "resumen": "Análisis completado. Revise los indicadores numéricos.",
             "factores": ["Análisis matemático completado"],
             "recomendaciones": ["Validación manual"]
         }
+    
+    def _generar_analisis_ia(self, contrato, riesgo, nivel, features, shap_values, score_ml, score_nlp):
+        # Respuestas previas para las mismas entradas evitan la llamada a Groq
+        prompt = self._construir_prompt(contrato, riesgo, nivel, features, shap_values, score_ml, score_nlp)
+        clave = None
+        if self.cache_llm is not None:
+            clave = self._clave_llm(prompt)
+            data = self.cache_llm.get_respuesta_llm(clave)
+            if data:
+                return data
+        
+        data = self._parsear_respuesta_llm(self._generar_con_retry(prompt))
+        if data:
+            if clave is not None:
+                self.cache_llm.save_respuesta_llm(clave, data)
+            return data
+        return self._analisis_llm_fallback()
+    
+    async def _generar_analisis_ia_async(self, contrato, riesgo, nivel, features, shap_values, score_ml, score_nlp):
+        """Versión async de `_generar_analisis_ia`: caché en hilos y llamada a Groq con AsyncGroq."""
+        prompt = self._construir_prompt(contrato, riesgo, nivel, features, shap_values, score_ml, score_nlp)
+        clave = None
+        if self.cache_llm is not None:
+            clave = self._clave_llm(prompt)
+            data = await asyncio.to_thread(self.cache_llm.get_respuesta_llm, clave)
+            if data:
+                return data
+        
+        data = self._parsear_respuesta_llm(await self._generar_con_retry_async(prompt))
+        if data:
+            if clave is not None:
+                await asyncio.to_thread(self.cache_llm.save_respuesta_llm, clave, data)
+            return data
+        return self._analisis_llm_fallback()
 
     def analizar_contrato_ml_solo(self, contrato_json):
         """Análisis rápido solo con ML, sin LLM (para endpoint /contratos)."""
-        X, texto, features = self._preprocesar(contrato_json)
+        return self.analizar_lote([contrato_json])[0]
+
+    def _explicar_shap(self, X):
+        """Valores SHAP por fila de X, ordenados por |valor| descendente.
         
-        # 1. Score ML (Financiero)
-        if self.iso_forest and not self.modo_solo_llm:
+        Listas vacías si SHAP no está disponible o para filas con NaN/inf (solo esas filas).
+        """
+        resultado = [[] for _ in range(len(X))]
+        filas = np.flatnonzero(np.isfinite(X).all(axis=1))
+        if self.usar_shap and len(filas):
             try:
-                score_raw = self.iso_forest.decision_function(X)[0]
-                risk_ml = float(np.clip(1 - ((score_raw - (-0.5)) / (0.5 - (-0.5))), 0, 1))
-            except Exception as e:
-                print(f"   ⚠️ Error en Isolation Forest: {e}. Usando z-score como fallback.")
-                # Calcular riesgo basado en z-score como fallback
-                z_score = features.get("Z-Score Valor", 0)
-                risk_ml = float(min(abs(z_score) / 5.0, 1.0))
-                score_raw = -risk_ml  # Simular score para compatibilidad
-        else:
-            # Modo degradado: usar z-score como proxy de riesgo
-            z_score = features.get("Z-Score Valor", 0)
-            risk_ml = float(min(abs(z_score) / 5.0, 1.0))
-            score_raw = -risk_ml
+                sv = self.shap_explainer.shap_values(X[filas])
+                if isinstance(sv, list): sv = sv[0]
+                sv = np.asarray(sv, dtype=np.float64)
+                # Un solo argsort por filas en lugar de ordenar dicts con una key de Python
+                ordenes = np.argsort(-np.abs(sv), axis=1, kind="stable")
+                cols = self.columnas_modelo
+                for i, fila, orden in zip(filas.tolist(), sv, ordenes):
+                    resultado[i] = [{"variable": cols[j], "valor": v} for j, v in zip(orden.tolist(), fila[orden].tolist())]
+            except: pass
+        return resultado
+    
+    def analizar_lote(self, contratos, incluir_shap=True):
+        """Análisis ML (sin LLM) de un lote de contratos con llamadas vectorizadas al modelo."""
+        if not contratos:
+            return []
+        
+        X, textos = self._preprocesar_batch(contratos)
+        return self._analizar_matriz(X, textos, incluir_shap)
+    
+    def _analizar_matriz(self, X, textos, incluir_shap=True):
+        """Núcleo de `analizar_lote` sobre features ya preprocesadas (evita repetir `_preprocesar`)."""
+        iso_forest = self.iso_forest
+        model_nlp = self.model_nlp
+        z_scores = X[:, 0]
+        
+        # 1. Score ML (Financiero)
+        # Fallback / modo degradado: z-score como proxy de riesgo (score simulado para compatibilidad)
+        risks_ml = np.minimum(np.abs(z_scores) / 5.0, 1.0)
+        scores_raw = -risks_ml
+        
+        if iso_forest is not None and not self.modo_solo_llm:
+            # Filas con NaN/inf se quedan con el fallback sin afectar al resto del lote
+            finitos = np.isfinite(X).all(axis=1)
+            todos_finitos = bool(finitos.all())
+            if not todos_finitos:
+                print(f"   ⚠️ {int((~finitos).sum())} contrato(s) con valores no numéricos. Usando z-score como fallback.")
+            if todos_finitos or finitos.any():
+                try:
+                    raw = self._decision_if(X if todos_finitos else X[finitos])
+                    scores_raw[finitos] = raw
+                    # 1 - (raw - (-0.5)) / (0.5 - (-0.5)) simplificado a 0.5 - raw
+                    risks_ml[finitos] = np.clip(0.5 - raw, 0.0, 1.0)
+                except Exception as e:
+                    print(f"   ⚠️ Error en Isolation Forest: {e}. Usando z-score como fallback.")
         
         # VETO: Si el precio es absurdo (Z > 3), Riesgo es 1.0 siempre
-        if features["Z-Score Valor"] > 3: 
-            risk_ml = 1.0
+        risks_ml[z_scores > 3] = 1.0
         
         # 2. Score NLP (Semántico)
         # Si embeddings están deshabilitados, usar score neutral (0.0)
-        risk_nlp = 0.0
+        risks_nlp = np.zeros(len(textos))
         
-        if self.model_nlp and hasattr(self, 'centroide'):
+        if model_nlp is not None and self._centroide32 is not None:
             try:
-                emb = self.model_nlp.encode(
-                    texto[:200], 
-                    convert_to_numpy=True, 
-                    show_progress_bar=False, 
-                    normalize_embeddings=True
-                )
-                dist = np.linalg.norm(emb - self.centroide)
-                risk_nlp = float(np.clip(dist / 2.0, 0, 1))
+                embs = self._embeddings(textos)
+                # ||e - c||² = ||e||² + ||c||² - 2·e·c, con ||e|| = 1 (embeddings normalizados).
+                # El centroide NO es unitario, por eso se usa su norma real.
+                sims = embs @ self._centroide32
+                dists = np.sqrt(np.maximum(0.0, 1.0 + self._centroide_norma2 - 2.0 * sims))
+                risks_nlp = np.clip(dists / 2.0, 0, 1)
             except Exception as e:
                 print(f"   ⚠️ Error calculando embeddings: {e}")
-                risk_nlp = 0.0
         
         # Si no hay embeddings, el análisis se basa solo en ML
         
-        # 3. SHAP (explicabilidad)
-        shap_values = []
-        if self.usar_shap:
-            try:
-                sv = self.shap_explainer.shap_values(X)
-                if isinstance(sv, list): sv = sv[0]
-                shap_values = [{"variable": col, "valor": float(val)} 
-                              for col, val in zip(self.columnas_modelo, sv[0])]
-            except: pass
+        # 3. SHAP (explicabilidad) - una sola llamada para todo el lote
+        shap_lote = self._explicar_shap(X) if incluir_shap else [[] for _ in textos]
         
         # 4. Combinación final
         # Si embeddings están habilitados: 70% ML, 30% NLP
         # Si embeddings deshabilitados: 100% ML (risk_nlp es 0.0)
-        if self.model_nlp:
-            score_combinado = risk_ml * 0.7 + risk_nlp * 0.3
+        if model_nlp is not None:
+            scores_combinados = risks_ml * 0.7 + risks_nlp * 0.3
         else:
             # Sin embeddings, confiar 100% en el análisis ML/financiero
-            score_combinado = risk_ml
-        
-        # 5. Determinar nivel de riesgo
-        if score_combinado >= 0.7:
-            nivel = "CRÍTICO"
-        elif score_combinado >= 0.5:
-            nivel = "ALTO" 
-        elif score_combinado >= 0.3:
-            nivel = "MEDIO"
-        else:
-            nivel = "BAJO"
+            scores_combinados = risks_ml
         
-        return {
-            "Meta_Data": {
-                "Score": float(score_combinado),
-                "Riesgo": nivel,
-                "Score_IsolationForest": float(risk_ml),
-                "Score_NLP_Embeddings": float(risk_nlp),
-                "Raw_IsolationForest": float(score_raw) if self.iso_forest else None,
-                "Distancia_Semantica": float(risk_nlp * 2.0)
-            },
-            "Detalle_SHAP": shap_values,
-            "Analisis_LLM": None  # Sin análisis LLM para rapidez
-        }
+        raw_disponible = iso_forest is not None
+        resultados = []
+        for score_combinado, risk_ml, risk_nlp, score_raw, shap_values in zip(
+            scores_combinados.tolist(), risks_ml.tolist(), risks_nlp.tolist(), scores_raw.tolist(), shap_lote
+        ):
+            # 5. Determinar nivel de riesgo
+            if score_combinado >= 0.7:
+                nivel = "CRÍTICO"
+            elif score_combinado >= 0.5:
+                nivel = "ALTO" 
+            elif score_combinado >= 0.3:
+                nivel = "MEDIO"
+            else:
+                nivel = "BAJO"
+            
+            resultados.append({
+                "Meta_Data": {
+                    "Score": score_combinado,
+                    "Riesgo": nivel,
+                    "Score_IsolationForest": risk_ml,
+                    "Score_NLP_Embeddings": risk_nlp,
+                    "Raw_IsolationForest": score_raw if raw_disponible else None,
+                    "Distancia_Semantica": risk_nlp * 2.0
+                },
+                "Detalle_SHAP": shap_values,
+                "Analisis_LLM": None  # Sin análisis LLM para rapidez
+            })
+        
+        return resultados
 
     def analizar_contrato(self, contrato_json, incluir_llm=True):
         """Análisis completo con ML + LLM opcional (para análisis detallado)."""
-        # Primero obtener análisis ML
-        resultado_ml = self.analizar_contrato_ml_solo(contrato_json)
+        # Primero obtener análisis ML (features calculadas una sola vez, también para el LLM)
+        X, texto, features = self._preprocesar(contrato_json)
+        resultado_ml = self._analizar_matriz(X, [texto])[0]
         
         # Si no se requiere LLM o no está disponible, retornar solo ML
         if not incluir_llm or not self.usar_llm:
             return resultado_ml
         
         # Análisis LLM adicional para análisis detallado
-        X, texto, features = self._preprocesar(contrato_json)
-        
-        score_combinado = resultado_ml["Meta_Data"]["Score"]
-        nivel = resultado_ml["Meta_Data"]["Riesgo"]
+        meta = resultado_ml["Meta_Data"]
+        score_combinado = meta["Score"]
+        nivel = meta["Riesgo"]
         shap_values = resultado_ml["Detalle_SHAP"]
-        risk_ml = resultado_ml["Meta_Data"]["Score_IsolationForest"]
-        risk_nlp = resultado_ml["Meta_Data"]["Score_NLP_Embeddings"]
+        risk_ml = meta["Score_IsolationForest"]
+        risk_nlp = meta["Score_NLP_Embeddings"]
         
         # Generar análisis LLM detallado
         analisis_llm = self._generar_analisis_ia(
@@ -363,4 +711,41 @@ class RadarColInferencia:
         resultado_completo = resultado_ml.copy()
         resultado_completo["Analisis_LLM"] = analisis_llm
         
-        return resultado_completo
\ No newline at end of file
+        return resultado_completo
+    
+    async def analizar_contrato_async(self, contrato_json, incluir_llm=True):
+        """Versión async de analizar_contrato para endpoints FastAPI.
+        
+        El trabajo CPU corre en hilos y Groq se consulta con AsyncGroq. Con riesgo BAJO
+        el prompt no usa SHAP, así que la llamada a Groq y el cálculo SHAP van en paralelo.
+        """
+        def _ml_sin_shap():
+            X, texto, features = self._preprocesar(contrato_json)
+            return self._analizar_matriz(X, [texto], incluir_shap=False)[0], X, features
+        
+        resultado, X, features = await asyncio.to_thread(_ml_sin_shap)
+        explicar = asyncio.to_thread(self._explicar_shap, X)
+        
+        if not incluir_llm or not self.usar_llm:
+            resultado["Detalle_SHAP"] = (await explicar)[0]
+            return resultado
+        
+        meta = resultado["Meta_Data"]
+        nivel = meta["Riesgo"]
+        argumentos = (meta["Score"], nivel, features)
+        scores = (meta["Score_IsolationForest"], meta["Score_NLP_Embeddings"])
+        
+        if nivel == "BAJO":
+            shap_lote, analisis_llm = await asyncio.gather(
+                explicar,
+                self._generar_analisis_ia_async(contrato_json, *argumentos, [], *scores)
+            )
+        else:
+            shap_lote = await explicar
+            analisis_llm = await self._generar_analisis_ia_async(
+                contrato_json, *argumentos, shap_lote[0], *scores
+            )
+        
+        resultado["Detalle_SHAP"] = shap_lote[0]
+        resultado["Analisis_LLM"] = analisis_llm
+        return resultado
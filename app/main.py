@@ -2,8 +2,11 @@
 Punto de entrada principal de la aplicación FastAPI.
 API de Análisis de Contratos Gubernamentales.
 """
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import ALLOWED_ORIGINS, CORS_ORIGINS_ENV, BASE_URL
@@ -17,6 +20,7 @@ from app.constants import (
 )
 from app.middlewares import LoggingMiddleware
 from app.controllers import health_router, contracts_router
+from app.services import ContractService
 
 # =====================================
 # Configuración de Logging
@@ -27,10 +31,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# =====================================
+# Ciclo de Vida de la Aplicación
+# =====================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Precarga el motor de análisis al iniciar y libera recursos al apagar."""
+    await asyncio.to_thread(ContractService.precargar_motor)
+    yield
+    await ContractService.cerrar_cliente_http()
+
+
 # =====================================
 # Inicialización de la Aplicación
 # =====================================
 app = FastAPI(
+    lifespan=lifespan,
+    # Serialización JSON con orjson (una sola pasada en C sobre el contenido validado)
+    default_response_class=ORJSONResponse,
     title=API_TITLE,
     description=API_DESCRIPTION,
     version=API_VERSION,
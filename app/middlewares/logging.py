@@ -2,47 +2,70 @@
 Middleware de logging para trazabilidad de peticiones.
 """
 import logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware para registrar detalles de cada petición HTTP."""
+class LoggingMiddleware:
+    """Middleware ASGI puro para registrar detalles de cada petición HTTP.
     
-    async def dispatch(self, request: Request, call_next):
+    No hereda de `BaseHTTPMiddleware`: lee la petición directamente del scope
+    ASGI y captura la respuesta envolviendo `send`, sin crear objetos
+    Request/Response ni tareas intermedias por petición.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        """Inicializa el middleware.
+        
+        Args:
+            app: Aplicación ASGI a envolver
+        """
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Procesa y registra información de la petición y respuesta.
         
         Args:
-            request: Objeto Request de FastAPI
-            call_next: Función para continuar el procesamiento
-            
-        Returns:
-            Response: Respuesta procesada
+            scope: Scope ASGI de la conexión
+            receive: Canal de recepción ASGI
+            send: Canal de envío ASGI
         """
+        # Solo peticiones HTTP; sin nivel INFO no se consultan cabeceras ni se formatean mensajes
+        if scope["type"] != "http" or not logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+        
         # Log información de la petición entrante
+        headers = Headers(scope=scope)
+        method = scope["method"]
         logger.info("=" * 80)
         logger.info("REQUEST:")
-        logger.info(f"   Method: {request.method}")
-        logger.info(f"   Path: {request.url.path}")
-        logger.info(f"   Origin: {request.headers.get('origin', 'No especificado')}")
-        logger.info(f"   Host: {request.headers.get('host', 'No especificado')}")
-        logger.info(f"   User-Agent: {request.headers.get('user-agent', 'No especificado')}")
+        logger.info("   Method: %s", method)
+        logger.info("   Path: %s", scope["path"])
+        logger.info("   Origin: %s", headers.get("origin", "No especificado"))
+        logger.info("   Host: %s", headers.get("host", "No especificado"))
+        logger.info("   User-Agent: %s", headers.get("user-agent", "No especificado"))
         
         # Log headers CORS específicos (si existen)
-        if request.method == "OPTIONS":
+        if method == "OPTIONS":
             logger.info("   CORS preflight detectada")
-            logger.info(f"   Access-Control-Request-Method: {request.headers.get('access-control-request-method', 'N/A')}")
-            logger.info(f"   Access-Control-Request-Headers: {request.headers.get('access-control-request-headers', 'N/A')}")
-        
-        # Procesar la petición
-        response = await call_next(request)
+            logger.info("   Access-Control-Request-Method: %s", headers.get("access-control-request-method", "N/A"))
+            logger.info("   Access-Control-Request-Headers: %s", headers.get("access-control-request-headers", "N/A"))
         
-        # Log respuesta
-        logger.info("RESPONSE:")
-        logger.info(f"   Status: {response.status_code}")
-        logger.info(f"   Access-Control-Allow-Origin: {response.headers.get('access-control-allow-origin', 'No configurado')}")
-        logger.info("=" * 80 + "\n")
+        async def send_con_log(message: Message):
+            # Log respuesta al enviar el inicio (status + cabeceras)
+            if message["type"] == "http.response.start":
+                response_headers = Headers(raw=message.get("headers", []))
+                logger.info("RESPONSE:")
+                logger.info("   Status: %s", message["status"])
+                logger.info(
+                    "   Access-Control-Allow-Origin: %s",
+                    response_headers.get("access-control-allow-origin", "No configurado")
+                )
+                logger.info("=" * 80 + "\n")
+            await send(message)
         
-        return response
+        # Procesar la petición
+        await self.app(scope, receive, send_con_log)
@@ -4,10 +4,15 @@ Optimiza performance evitando re-análisis de contratos ya procesados.
 """
 import os
 import json
+import logging
 import hashlib
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any, Tuple
 
+import orjson
+
+from app.models import ShapValueModel
+
 # Importación opcional de libsql
 try:
     import libsql
@@ -17,6 +22,9 @@ except ImportError:
     libsql = None
     HAS_LIBSQL = False
 
+# Configurar logger
+logger = logging.getLogger(__name__)
+
 
 class CacheService:
     """Servicio singleton para gestionar caché de análisis en Turso."""
@@ -39,20 +47,20 @@ class CacheService:
         """Establece conexión con Turso usando variables de entorno."""
         try:
             if not HAS_LIBSQL:
-                print("⚠️ libsql-experimental no disponible. Caché deshabilitado.")
+                logger.warning("⚠️ libsql-experimental no disponible. Caché deshabilitado.")
                 return
                 
             url = os.getenv("TURSO_DATABASE_URL")
             auth_token = os.getenv("TURSO_AUTH_TOKEN")
             
             if not url or not auth_token:
-                print("⚠️ TURSO_DATABASE_URL o TURSO_AUTH_TOKEN no configurados. Caché deshabilitado.")
+                logger.warning("⚠️ TURSO_DATABASE_URL o TURSO_AUTH_TOKEN no configurados. Caché deshabilitado.")
                 return
             
             self._conn = libsql.connect(url, auth_token=auth_token)
-            print(f"✅ Conectado a Turso: {url}")
+            logger.info("✅ Conectado a Turso: %s", url)
         except Exception as e:
-            print(f"❌ Error conectando a Turso: {e}")
+            logger.error("❌ Error conectando a Turso: %s", e)
             self._conn = None
     
     @property
@@ -62,7 +70,7 @@ class CacheService:
     
     def _get_ttl_days(self, tipo: str) -> int:
         """Obtiene TTL en días según tipo de caché."""
-        defaults = {"stats": 1, "ligero": 7, "detallado": 7}
+        defaults = {"stats": 1, "ligero": 7, "detallado": 7, "llm": 30}
         env_key = f"CACHE_TTL_{tipo.upper()}"
         return int(os.getenv(env_key, defaults.get(tipo, 7)))
     
@@ -100,7 +108,7 @@ class CacheService:
             result = self._conn.execute(query, (filtro_hash, now)).fetchone()
             
             if result:
-                print(f"✅ Cache HIT: Estadísticas globales (hash: {filtro_hash[:8]}...)")
+                logger.debug("✅ Cache HIT: Estadísticas globales (hash: %.8s...)", filtro_hash)
                 return {
                     "total_contratos": result[0],
                     "contratos_alto_riesgo": result[1],
@@ -110,10 +118,10 @@ class CacheService:
                     "monto_total_cop": result[5]
                 }
             
-            print(f"❌ Cache MISS: Estadísticas globales (hash: {filtro_hash[:8]}...)")
+            logger.debug("❌ Cache MISS: Estadísticas globales (hash: %.8s...)", filtro_hash)
             return None
         except Exception as e:
-            print(f"❌ Error leyendo estadísticas: {e}")
+            logger.error("❌ Error leyendo estadísticas: %s", e)
             return None
     
     def save_estadisticas(
@@ -149,9 +157,9 @@ class CacheService:
             ))
             self._conn.commit()
             
-            print(f"💾 Estadísticas guardadas (hash: {filtro_hash[:8]}..., {total_contratos} contratos)")
+            logger.debug("💾 Estadísticas guardadas (hash: %.8s..., %s contratos)", filtro_hash, total_contratos)
         except Exception as e:
-            print(f"❌ Error guardando estadísticas: {e}")
+            logger.error("❌ Error guardando estadísticas: %s", e)
     
     # ==================== ANÁLISIS LIGERO ====================
     
@@ -182,7 +190,7 @@ class CacheService:
                 }
             return None
         except Exception as e:
-            print(f"❌ Error leyendo análisis ligero: {e}")
+            logger.error("❌ Error leyendo análisis ligero: %s", e)
             return None
     
     def get_analisis_ligero_batch(self, ids_contratos: List[str]) -> Dict[str, Dict[str, Any]]:
@@ -215,10 +223,10 @@ class CacheService:
                     "score_nlp_embeddings": row[7]
                 }
             
-            print(f"✅ Cache HIT: {len(cached)}/{len(ids_contratos)} análisis ligeros")
+            logger.debug("✅ Cache HIT: %d/%d análisis ligeros", len(cached), len(ids_contratos))
             return cached
         except Exception as e:
-            print(f"❌ Error en batch ligero: {e}")
+            logger.error("❌ Error en batch ligero: %s", e)
             return {}
     
     def save_analisis_ligero(
@@ -254,7 +262,7 @@ class CacheService:
             ))
             self._conn.commit()
         except Exception as e:
-            print(f"❌ Error guardando análisis ligero {id_contrato}: {e}")
+            logger.error("❌ Error guardando análisis ligero %s: %s", id_contrato, e)
     
     def save_analisis_ligero_batch(self, analisis_list: List[Dict[str, Any]]):
         """Guarda múltiples análisis ligeros en batch."""
@@ -286,9 +294,9 @@ class CacheService:
                 ))
             
             self._conn.commit()
-            print(f"💾 {len(analisis_list)} análisis ligeros guardados en batch")
+            logger.debug("💾 %d análisis ligeros guardados en batch", len(analisis_list))
         except Exception as e:
-            print(f"❌ Error en batch save ligero: {e}")
+            logger.error("❌ Error en batch save ligero: %s", e)
     
     # ==================== ANÁLISIS DETALLADO ====================
     
@@ -310,7 +318,7 @@ class CacheService:
             result = self._conn.execute(query, (id_contrato, now)).fetchone()
             
             if result:
-                print(f"✅ Cache HIT: Análisis detallado ({id_contrato})")
+                logger.debug("✅ Cache HIT: Análisis detallado (%s)", id_contrato)
                 return {
                     "resumen_ejecutivo": result[0],
                     "factores_principales": json.loads(result[1]) if result[1] else [],
@@ -324,10 +332,10 @@ class CacheService:
                     "meta_data": json.loads(result[9]) if result[9] else {}
                 }
             
-            print(f"❌ Cache MISS: Análisis detallado ({id_contrato})")
+            logger.debug("❌ Cache MISS: Análisis detallado (%s)", id_contrato)
             return None
         except Exception as e:
-            print(f"❌ Error leyendo análisis detallado: {e}")
+            logger.error("❌ Error leyendo análisis detallado: %s", e)
             return None
     
     def save_analisis_detallado(
@@ -336,7 +344,7 @@ class CacheService:
         resumen_ejecutivo: str,
         factores_principales: List[str],
         recomendaciones: List[str],
-        shap_values: List[Dict[str, Any]],
+        shap_values: List[ShapValueModel],
         score_final: float,
         score_isolation_forest: float,
         score_nlp_embeddings: float,
@@ -366,7 +374,8 @@ class CacheService:
                 resumen_ejecutivo,
                 json.dumps(factores_principales),
                 json.dumps(recomendaciones),
-                json.dumps(shap_values),
+                # Los campos de ShapValueModel son primitivos: __dict__ se serializa directo
+                orjson.dumps([sv.__dict__ for sv in shap_values]).decode(),
                 score_final,
                 score_isolation_forest,
                 score_nlp_embeddings,
@@ -378,9 +387,52 @@ class CacheService:
             ))
             self._conn.commit()
             
-            print(f"💾 Análisis detallado guardado ({id_contrato})")
+            logger.debug("💾 Análisis detallado guardado (%s)", id_contrato)
+        except Exception as e:
+            logger.error("❌ Error guardando análisis detallado: %s", e)
+    
+    # ==================== RESPUESTAS LLM ====================
+    
+    def get_respuesta_llm(self, clave: str) -> Optional[Dict[str, Any]]:
+        """Obtiene una respuesta LLM cacheada por hash de las entradas del prompt."""
+        if not self.is_enabled:
+            return None
+        
+        try:
+            query = """
+                SELECT respuesta FROM llm_respuestas
+                WHERE clave = ? AND fecha_expiracion > ?
+            """
+            now = datetime.now().isoformat()
+            result = self._conn.execute(query, (clave, now)).fetchone()
+            
+            if result:
+                logger.debug("✅ Cache HIT: Respuesta LLM (%.8s...)", clave)
+                return orjson.loads(result[0])
+            return None
+        except Exception as e:
+            logger.error("❌ Error leyendo respuesta LLM: %s", e)
+            return None
+    
+    def save_respuesta_llm(self, clave: str, respuesta: Dict[str, Any]):
+        """Guarda una respuesta LLM ya validada en caché."""
+        if not self.is_enabled:
+            return
+        
+        try:
+            expiracion = self._calculate_expiration("llm")
+            
+            query = """
+                INSERT OR REPLACE INTO llm_respuestas (clave, respuesta, fecha_expiracion)
+                VALUES (?, ?, ?)
+            """
+            
+            self._conn.execute(query, (clave, orjson.dumps(respuesta).decode(), expiracion))
+            self._conn.commit()
+            
+            logger.debug("💾 Respuesta LLM guardada (%.8s...)", clave)
         except Exception as e:
-            print(f"❌ Error guardando análisis detallado: {e}")
+            logger.error("❌ Error guardando respuesta LLM: %s", e)
     
     # ==================== UTILIDADES ====================
     
@@ -392,16 +444,19 @@ class CacheService:
         try:
             now = datetime.now().isoformat()
             
-            tables = ["estadisticas_globales", "contratos_analisis_ligero", "contratos_analisis_detallado"]
+            tables = [
+                "estadisticas_globales", "contratos_analisis_ligero",
+                "contratos_analisis_detallado", "llm_respuestas"
+            ]
             for table in tables:
                 result = self._conn.execute(
                     f"DELETE FROM {table} WHERE fecha_expiracion <= ?",
                     (now,)
                 )
                 self._conn.commit()
-                print(f"🧹 Limpieza {table}: registros eliminados")
+                logger.info("🧹 Limpieza %s: registros eliminados", table)
         except Exception as e:
-            print(f"❌ Error en cleanup: {e}")
+            logger.error("❌ Error en cleanup: %s", e)
     
     def get_cache_stats(self) -> Dict[str, int]:
         """Obtiene estadísticas del caché."""
@@ -413,7 +468,8 @@ class CacheService:
             tables = {
                 "estadisticas_globales": "total_stats",
                 "contratos_analisis_ligero": "total_ligero",
-                "contratos_analisis_detallado": "total_detallado"
+                "contratos_analisis_detallado": "total_detallado",
+                "llm_respuestas": "total_llm"
             }
             
             for table, key in tables.items():
@@ -422,14 +478,14 @@ class CacheService:
             
             return stats
         except Exception as e:
-            print(f"❌ Error obteniendo stats: {e}")
+            logger.error("❌ Error obteniendo stats: %s", e)
             return {}
     
     def close(self):
         """Cierra la conexión a Turso."""
         if self._conn:
             self._conn.close()
-            print("🔌 Conexión a Turso cerrada")
+            logger.info("🔌 Conexión a Turso cerrada")
             self._conn = None
 
 
@@ -1,13 +1,24 @@
 """
 Servicio de contratos - Lógica de negocio para gestión de contratos.
 """
-import requests
+import json
+import asyncio
+import importlib.util
+import itertools
+import string
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+import httpx
+import orjson
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime
-from fastapi import HTTPException
+from cachetools import TTLCache
+from types import MappingProxyType
+from typing import List, Dict, Any, Mapping, Optional
+from fastapi import BackgroundTasks, HTTPException
 
-from app.config import BASE_URL, GROQ_API_KEY, RUTA_ARTEFACTOS
+from app.config import BASE_URL, GROQ_API_KEY, RUTA_ARTEFACTOS, SOCRATA_APP_TOKEN, SOCRATA_PAGE_SIZE
 from app.models import (
     NivelRiesgo,
     MetadataModel,
@@ -17,7 +28,7 @@ from app.models import (
     ShapValueModel,
     AnalysisModel
 )
-from app.utils import estandarizar_texto
+from app.utils import estandarizar_texto, estandarizar_textos, soql_where_in
 from app.core import RadarColInferencia
 from app.services.cache_service import cache_service
 
@@ -25,11 +36,121 @@ from app.services.cache_service import cache_service
 # Configurar logger
 logger = logging.getLogger(__name__)
 
+# Confianza reportada según el origen del análisis
+_CONFIANZA_MODELO = 87.5  # Confianza del modelo (puede ajustarse)
+_CONFIANZA_CACHE = 85.0  # Confianza del caché
+
+# Tiempo máximo de espera para la API de datos.gov.co (las consultas SoQL pueden ser lentas)
+_HTTP_TIMEOUT_SEGUNDOS = 30.0
+
+# Separador visual de los bloques de log del análisis detallado
+_SEPARADOR_LOG = "=" * 80
+
+# Cabeceras comunes para datos.gov.co (app token de Socrata si está configurado)
+_SOCRATA_HEADERS = {"X-App-Token": SOCRATA_APP_TOKEN} if SOCRATA_APP_TOKEN else {}
+
+# Pool de conexiones keep-alive del cliente compartido (evita un handshake TLS por consulta)
+_HTTP_LIMITES = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+
+# HTTP/2 solo si el paquete opcional `h2` está instalado
+_HTTP2_DISPONIBLE = importlib.util.find_spec("h2") is not None
+
+# Cachés en proceso para evitar consultas repetidas a datos.gov.co
+_CONTRATOS_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=300)  # Contratos por id_contrato (5 min)
+_CONTRATOS_CACHE_LOCK = threading.Lock()  # Se accede desde hilos de trabajo
+_FILAS_CACHE: TTLCache = TTLCache(maxsize=256, ttl=60)  # Filas del listado por filtro (1 min)
+
+# Respuesta de contingencia cuando el motor de análisis no está disponible
+_RESUMEN_CONTINGENCIA = (
+    "Análisis del contrato {contract_id}. "
+    "El motor de análisis no está disponible temporalmente."
+)
+_FACTORES_CONTINGENCIA = ("Análisis en modo de contingencia",)
+_RECOMENDACIONES_CONTINGENCIA = ("Verificar configuración del sistema de análisis",)
+
+# Contrato sintético para precalentar el motor al iniciar la aplicación
+_CONTRATO_PRECALENTAMIENTO = MappingProxyType({
+    "id_contrato": "PRECALENTAMIENTO",
+    "valor_del_contrato": "50000000",
+    "objeto_del_contrato": "Prestación de servicios profesionales de apoyo a la gestión",
+    "nit_entidad": "0",
+    "plazo_de_ejec_del_contrato": "180",
+    "fecha_de_inicio_del_contrato": "2025-01-01T00:00:00.000"
+})
+
+# Nivel de riesgo del motor (CRÍTICO, ALTO, BAJO) -> nivel expuesto por la API
+_NIVEL_MAP: Mapping[str, NivelRiesgo] = MappingProxyType({
+    "CRÍTICO": NivelRiesgo.ALTO,
+    "ALTO": NivelRiesgo.MEDIO,
+    "BAJO": NivelRiesgo.BAJO
+})
+
+
+# Tabla de traducción para nombres de variables SHAP: minúsculas y ' '/'-' -> '_' en una pasada
+_SHAP_NORM_TABLE = str.maketrans({
+    " ": "_",
+    "-": "_",
+    **{c: c.lower() for c in string.ascii_uppercase}
+})
+
+
+@lru_cache(maxsize=64)
+def _normalizar_variable_shap(variable: str) -> str:
+    """Normaliza el nombre de una variable SHAP (p. ej. 'Z-Score Valor' -> 'z_score_valor')."""
+    return variable.translate(_SHAP_NORM_TABLE)
+
+
+def _fecha_analisis_utc() -> str:
+    """Retorna la fecha y hora actual en UTC con formato ISO 8601 (YYYY-MM-DDTHH:MM:SSZ)."""
+    t = time.gmtime()
+    return "%04d-%02d-%02dT%02d:%02d:%02dZ" % (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec)
+
+
 class ContractService:
     """Servicio para gestionar operaciones relacionadas con contratos."""
     
     # Instancia singleton del motor de análisis
     _motor_analisis: Optional[RadarColInferencia] = None
+    _motor_lock = threading.Lock()
+    
+    # Mapeo de variables técnicas a descripciones legibles
+    _SHAP_DESCRIPCIONES: Mapping[str, str] = MappingProxyType({
+        "Z-Score Valor": "Desviación del monto respecto al promedio de la entidad",
+        "Valor Logaritmo": "Escala logarítmica del valor del contrato",
+        "Costo por Caracter": "Ratio entre monto y complejidad de la descripción",
+        "Indice Dependencia Proveedor": "Nivel de concentración con proveedores específicos",
+        "Pct Tiempo Adicionado": "Porcentaje de tiempo adicionado al plazo original",
+        "Duracion Dias": "Duración del contrato en días",
+        "Dias tras Firma": "Días transcurridos desde la firma",
+        "Anio Firma": "Año de firma del contrato",
+        "Mes Firma": "Mes de firma del contrato"
+    })
+    
+    # Cliente HTTP asíncrono compartido (reutiliza conexiones entre peticiones)
+    _cliente_http: Optional[httpx.AsyncClient] = None
+    
+    @classmethod
+    def _obtener_cliente_http(cls) -> httpx.AsyncClient:
+        """Obtiene o inicializa el cliente HTTP asíncrono para la API de datos.gov.co.
+        
+        Returns:
+            httpx.AsyncClient: Cliente HTTP compartido
+        """
+        if cls._cliente_http is None or cls._cliente_http.is_closed:
+            cls._cliente_http = httpx.AsyncClient(
+                timeout=_HTTP_TIMEOUT_SEGUNDOS,
+                headers=_SOCRATA_HEADERS,
+                limits=_HTTP_LIMITES,
+                http2=_HTTP2_DISPONIBLE
+            )
+        return cls._cliente_http
+    
+    @classmethod
+    async def cerrar_cliente_http(cls) -> None:
+        """Cierra el cliente HTTP compartido (se llama al apagar la aplicación)."""
+        if cls._cliente_http is not None:
+            await cls._cliente_http.aclose()
+            cls._cliente_http = None
     
     @classmethod
     def _obtener_motor(cls) -> RadarColInferencia:
@@ -38,14 +159,22 @@ class ContractService:
         Returns:
             RadarColInferencia: Instancia del motor de análisis
         """
-        if cls._motor_analisis is None:
+        if cls._motor_analisis is not None:
+            return cls._motor_analisis
+        
+        # Doble verificación: hilos concurrentes (asyncio.to_thread) no cargan el motor dos veces
+        with cls._motor_lock:
+            if cls._motor_analisis is not None:
+                return cls._motor_analisis
+            
             logger.info("Inicializando motor RadarColInferencia con configuración Groq...")
             logger.info(f"   Ruta artefactos: {RUTA_ARTEFACTOS}")
             logger.info(f"   Groq API Key configurada: {'Sí' if GROQ_API_KEY else 'No (solo ML)'}")
             
             cls._motor_analisis = RadarColInferencia(
                 groq_api_key=GROQ_API_KEY,  # Usa Groq API key
-                ruta_artefactos=RUTA_ARTEFACTOS
+                ruta_artefactos=RUTA_ARTEFACTOS,
+                cache_llm=cache_service
             )
             
             logger.info("Motor inicializado correctamente")
@@ -54,6 +183,21 @@ class ContractService:
             
         return cls._motor_analisis
     
+    @classmethod
+    def precargar_motor(cls) -> None:
+        """Carga el motor y ejecuta un análisis ML de prueba (se llama al iniciar la app).
+        
+        Así la carga de artefactos y la primera inferencia (IsolationForest,
+        SHAP, embeddings) no recaen sobre la primera petición de un usuario.
+        Un fallo aquí no impide el arranque: el motor se reintenta bajo demanda.
+        """
+        try:
+            motor = cls._obtener_motor()
+            motor.analizar_contrato_ml_solo(cls._preparar_datos_para_motor(_CONTRATO_PRECALENTAMIENTO))
+            logger.info("🔥 Motor de análisis precargado")
+        except Exception as e:
+            logger.warning("⚠️ No se pudo precargar el motor de análisis: %s", e)
+    
     @classmethod
     def _preparar_datos_para_motor(cls, contrato: Dict[str, Any]) -> Dict[str, Any]:
         """Transforma los datos de la API externa al formato esperado por el motor.
@@ -66,11 +210,13 @@ class ContractService:
         """
         # Extraer año y mes de la fecha de inicio
         fecha_inicio = contrato.get("fecha_de_inicio_del_contrato", "2025-01-01")
+        # Formato ISO fijo (YYYY-MM-DD...): basta con cortar la cadena, sin strptime
         try:
-            fecha_obj = datetime.strptime(fecha_inicio[:10], "%Y-%m-%d")
-            anio_firma = fecha_obj.year
-            mes_firma = fecha_obj.month
-        except:
+            anio_firma = int(fecha_inicio[0:4])
+            mes_firma = int(fecha_inicio[5:7])
+            if not 1 <= mes_firma <= 12:
+                raise ValueError(fecha_inicio)
+        except (ValueError, TypeError, IndexError):
             anio_firma = 2025
             mes_firma = 1
         
@@ -86,10 +232,11 @@ class ContractService:
             "Indice Dependencia": 0.0  # Valor por defecto, puede calcularse con datos históricos
         }
         
-        logger.debug(f"Datos preparados para el motor:")
-        logger.debug(f"   💰 Valor: ${datos_motor['Valor del Contrato']:,.0f}")
-        logger.debug(f"   📅 Fecha: {anio_firma}-{mes_firma:02d}")
-        logger.debug(f"   ⏱️  Duración: {datos_motor['Duracion Dias']} días")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Datos preparados para el motor:")
+            logger.debug("   💰 Valor: $%s", f"{datos_motor['Valor del Contrato']:,.0f}")
+            logger.debug("   📅 Fecha: %d-%02d", anio_firma, mes_firma)
+            logger.debug("   ⏱️  Duración: %s días", datos_motor["Duracion Dias"])
         
         return datos_motor
     
@@ -103,12 +250,7 @@ class ContractService:
         Returns:
             NivelRiesgo: Enum del nivel de riesgo
         """
-        mapeo = {
-            "CRÍTICO": NivelRiesgo.ALTO,
-            "ALTO": NivelRiesgo.MEDIO,
-            "BAJO": NivelRiesgo.BAJO
-        }
-        return mapeo.get(nivel, NivelRiesgo.MEDIO)
+        return _NIVEL_MAP.get(nivel, NivelRiesgo.MEDIO)
     
     @classmethod
     def _construir_shap_values(
@@ -125,7 +267,7 @@ class ContractService:
         Returns:
             List[ShapValueModel]: Lista de modelos SHAP para la respuesta
         """
-        logger.debug(f"🔧 Construyendo SHAP values desde {len(detalle_shap)} elementos")
+        logger.debug("🔧 Construyendo SHAP values desde %d elementos", len(detalle_shap))
         
         # Validar entrada
         if not detalle_shap or not isinstance(detalle_shap, list):
@@ -135,18 +277,6 @@ class ContractService:
         if not contrato or not isinstance(contrato, dict):
             logger.warning("contrato está vacío o no es un dict")
             return []
-        # Mapeo de variables técnicas a descripciones legibles
-        descripciones = {
-            "Z-Score Valor": "Desviación del monto respecto al promedio de la entidad",
-            "Valor Logaritmo": "Escala logarítmica del valor del contrato",
-            "Costo por Caracter": "Ratio entre monto y complejidad de la descripción",
-            "Indice Dependencia Proveedor": "Nivel de concentración con proveedores específicos",
-            "Pct Tiempo Adicionado": "Porcentaje de tiempo adicionado al plazo original",
-            "Duracion Dias": "Duración del contrato en días",
-            "Dias tras Firma": "Días transcurridos desde la firma",
-            "Anio Firma": "Año de firma del contrato",
-            "Mes Firma": "Mes de firma del contrato"
-        }
         
         # Valores actuales para mostrar en el detalle
         valores_actuales = {
@@ -166,7 +296,7 @@ class ContractService:
             try:
                 # Validar estructura del item
                 if not isinstance(item, dict):
-                    logger.warning(f"Item SHAP {i} no es un dict: {type(item)}")
+                    logger.warning("Item SHAP %d no es un dict: %s", i, type(item))
                     continue
                     
                 # Extraer datos del item
@@ -175,52 +305,52 @@ class ContractService:
                 
                 # Validar campos requeridos
                 if not variable:
-                    logger.warning(f"Item SHAP {i} sin campo 'variable'")
+                    logger.warning("Item SHAP %d sin campo 'variable'", i)
                     continue
                     
                 if not isinstance(valor, (int, float)):
-                    logger.warning(f"Item SHAP {i} 'valor' no es numérico: {type(valor)}")
+                    logger.warning("Item SHAP %d 'valor' no es numérico: %s", i, type(valor))
                     try:
                         valor = float(valor)
                     except (ValueError, TypeError):
                         valor = 0.0
                 
                 # Normalizar nombre de variable
-                variable_normalizada = variable.lower().replace(" ", "_").replace("-", "_")
+                variable_normalizada = _normalizar_variable_shap(variable)
                 
                 # Crear modelo SHAP
                 shap_model = ShapValueModel(
                     variable=variable_normalizada,
                     value=round(float(valor), 4),  # Más precisión
-                    description=descripciones.get(variable, f"Variable: {variable}"),
+                    description=cls._SHAP_DESCRIPCIONES.get(variable, f"Variable: {variable}"),
                     actualValue=valores_actuales.get(variable, "Calculado")
                 )
                 
                 shap_models.append(shap_model)
-                logger.debug(f"   ✓ SHAP {i}: {variable} = {valor:.4f}")
+                logger.debug("   ✓ SHAP %d: %s = %.4f", i, variable, valor)
                 
             except Exception as e:
-                logger.error(f"Error procesando item SHAP {i}: {e}")
-                logger.error(f"   Item data: {item}")
+                logger.error("Error procesando item SHAP %d: %s", i, e)
+                logger.error("   Item data: %s", item)
                 continue
         
-        # Ordenar por importancia (valor absoluto) descendente
-        shap_models.sort(key=lambda x: abs(x.value), reverse=True)
+        # El motor ya entrega los valores ordenados por importancia (|valor| descendente)
         
-        logger.info(f"✅ Construidos {len(shap_models)} SHAP values válidos")
-        if shap_models:
-            logger.debug(f"   Top 3 variables más importantes:")
-            for i, model in enumerate(shap_models[:3]):
-                logger.debug(f"   {i+1}. {model.variable}: {model.value:.4f} ({model.description})")
+        logger.info("✅ Construidos %d SHAP values válidos", len(shap_models))
+        if shap_models and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("   Top 3 variables más importantes:")
+            for i, model in enumerate(itertools.islice(shap_models, 3)):
+                logger.debug("   %d. %s: %.4f (%s)", i + 1, model.variable, model.value, model.description)
         
         return shap_models
     
     @classmethod
-    def obtener_contratos_filtrados(
+    async def obtener_contratos_filtrados(
         cls,
         where_clause: str,
         analyze_all: bool = True,
-        return_limit: int = 10
+        return_limit: int = 10,
+        forzar_refresco: bool = False
     ) -> tuple[int, float, int, List[ContratoDetalleModel]]:
         """Obtiene contratos filtrados con análisis rápido de muestra.
         
@@ -231,6 +361,7 @@ class ContractService:
             where_clause: Cláusula WHERE de SoQL para filtrado
             analyze_all: Ignorado, siempre analiza solo 10 contratos (modo muestra)
             return_limit: Número de contratos a consultar y analizar (default: 10)
+            forzar_refresco: Si es True, ignora el caché en proceso de filas
             
         Returns:
             tuple: (total_contratos_muestra, monto_total_muestra, contratos_alto_riesgo, contratos_mapeados)
@@ -255,7 +386,7 @@ class ContractService:
         
         where_final = " AND ".join(filtros_combinados)
         
-        print(f"🔍 Filtros aplicados: {len(filtros_combinados)} filtros de calidad + filtros usuario")
+        logger.debug("🔍 Filtros aplicados: %d filtros de calidad + filtros usuario", len(filtros_combinados))
 
         # ==================== SISTEMA DE CACHÉ ====================
         # Generar hash único de filtros para caché (incluye limit=10)
@@ -266,54 +397,46 @@ class ContractService:
             "sample_mode": True  # Modo muestra rápida
         })
         
-        # Intentar obtener estadísticas del caché
-        stats_cached = cache_service.get_estadisticas_cached(filtro_hash)
+        # Consulta a SoQL y lectura de estadísticas en Turso en paralelo (latencia ~1 RTT)
+        data, stats_cached = await asyncio.gather(
+            cls._obtener_filas(where_final, return_limit, forzar_refresco),
+            asyncio.to_thread(cache_service.get_estadisticas_cached, filtro_hash)
+        )
         
         if stats_cached and cache_service.is_enabled:
-            print(f"\n✅ USANDO CACHÉ - Stats encontradas")
-            print(f"   Total contratos: {stats_cached['total_contratos']:,}")
-            print(f"   Alto riesgo: {stats_cached['contratos_alto_riesgo']:,}")
-            print(f"   Monto total: ${stats_cached['monto_total_cop']:,.2f} COP\n")
-            
-            # Obtener IDs de contratos (ordenados por fecha DESC)
-            ids_params = {
-                "$select": "id_contrato,nombre_entidad,valor_del_contrato,fecha_de_inicio_del_contrato,objeto_del_contrato",
-                "$limit": return_limit,
-                "$order": "fecha_de_inicio_del_contrato DESC"
-            }
-            if where_final:
-                ids_params["$where"] = where_final
-            
-            ids_response = requests.get(BASE_URL, params=ids_params)
-            contratos_data = ids_response.json()
+            logger.debug("✅ USANDO CACHÉ - Stats encontradas")
+            logger.debug("   Total contratos: %s", stats_cached["total_contratos"])
+            logger.debug("   Alto riesgo: %s", stats_cached["contratos_alto_riesgo"])
+            logger.debug("   Monto total: $%.2f COP", stats_cached["monto_total_cop"])
             
             # Intentar obtener análisis del caché
-            ids_contratos = [c.get("id_contrato") for c in contratos_data if c.get("id_contrato")]
-            analisis_cached = cache_service.get_analisis_ligero_batch(ids_contratos)
+            ids_contratos = [c.get("id_contrato") for c in data if c.get("id_contrato")]
+            analisis_cached = await asyncio.to_thread(cache_service.get_analisis_ligero_batch, ids_contratos)
             
             # Construir respuesta con datos cached
             contratos_mapeados = []
-            for contrato in contratos_data:
+            descripciones = estandarizar_textos(c.get("objeto_del_contrato", "") for c in data)
+            for contrato, descripcion in zip(data, descripciones):
                 id_contrato = contrato.get("id_contrato")
                 cached_data = analisis_cached.get(id_contrato)
                 
                 if cached_data:
                     # Usar datos del caché
-                    descripcion = estandarizar_texto(contrato.get("objeto_del_contrato", ""))
-                    contratos_mapeados.append(ContratoDetalleModel(
-                        Contrato=ContratoInfoModel(
+                    # Datos ya normalizados: se omite la validación de Pydantic
+                    contratos_mapeados.append(ContratoDetalleModel.model_construct(
+                        Contrato=ContratoInfoModel.model_construct(
                             Codigo=id_contrato,
                             Descripcion=descripcion
                         ),
                         Entidad=cached_data["nombre_entidad"],
                         Monto=str(cached_data["valor_contrato"]),
                         FechaInicio=cached_data["fecha_inicio"],
-                        NivelRiesgo=cached_data["nivel_riesgo"],
-                        Anomalia=cached_data["anomalia"]
+                        NivelRiesgo=NivelRiesgo(cached_data["nivel_riesgo"]),
+                        Anomalia=float(cached_data["anomalia"])
                     ))
             
             if len(contratos_mapeados) == len(ids_contratos):
-                print(f"✅ Todos los contratos recuperados del caché ({len(contratos_mapeados)})")
+                logger.debug("✅ Todos los contratos recuperados del caché (%d)", len(contratos_mapeados))
                 return (
                     stats_cached["total_contratos"],
                     stats_cached["monto_total_cop"],
@@ -321,69 +444,205 @@ class ContractService:
                     contratos_mapeados
                 )
             else:
-                print(f"⚠️ Caché parcial: {len(contratos_mapeados)}/{len(ids_contratos)} contratos")
-                print(f"   Procediendo con análisis completo...")
+                logger.debug(
+                    "⚠️ Caché parcial: %d/%d contratos. Procediendo con análisis completo...",
+                    len(contratos_mapeados), len(ids_contratos)
+                )
         
         # ==================== ANÁLISIS COMPLETO (Sin caché o caché incompleto) ====================
-        print(f"\n📊 ANÁLISIS DE MUESTRA RÁPIDA:")
-        print(f"   Modo: Solo {return_limit} contratos más recientes")
-        print(f"   Orden: Fecha de inicio DESC")
-        print(f"   Análisis: ML sin LLM (rápido)\n")
+        logger.debug(
+            "📊 ANÁLISIS DE MUESTRA RÁPIDA: %d contratos más recientes (fecha DESC, ML sin LLM)",
+            return_limit
+        )
+        
+        # El análisis ML es CPU-bound: se ejecuta en un hilo para no bloquear el event loop
+        return await asyncio.to_thread(
+            cls._analizar_muestra, data, where_clause, filtro_hash, return_limit
+        )
 
-        # Obtener solo los primeros return_limit contratos
+    @classmethod
+    async def _obtener_filas(
+        cls,
+        where_final: str,
+        return_limit: int,
+        forzar_refresco: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Obtiene las filas del listado desde datos.gov.co (o del caché en proceso).
+        
+        Una sola consulta a SoQL: las mismas filas sirven para el caché y para el análisis.
+        
+        Args:
+            where_final: Cláusula WHERE completa (calidad + usuario)
+            return_limit: Número de contratos a consultar
+            forzar_refresco: Si es True, ignora el caché en proceso de filas
+        
+        Returns:
+            list: Contratos ordenados por fecha de inicio descendente
+        
+        Raises:
+            HTTPException: Si hay error en la comunicación con la API externa
+        """
+        filas_key = (where_final, return_limit)
+        data = None if forzar_refresco else _FILAS_CACHE.get(filas_key)
+        
+        if data is not None:
+            logger.debug("⚡ Filas del listado servidas desde caché en proceso")
+            return data
+        
         data_params = {
             "$limit": return_limit,
             "$order": "fecha_de_inicio_del_contrato DESC"
         }
         if where_final:
             data_params["$where"] = where_final
-            
-        data_response = requests.get(BASE_URL, params=data_params)
-
-        if data_response.status_code != 200:
+        
+        if 0 < SOCRATA_PAGE_SIZE < return_limit:
+            # Páginas concurrentes sobre el mismo cliente; :id desempata el orden entre páginas
+            data_params["$order"] += ",:id"
+            paginas = await asyncio.gather(*(
+                cls._consultar_filas({
+                    **data_params,
+                    "$offset": offset,
+                    "$limit": min(SOCRATA_PAGE_SIZE, return_limit - offset)
+                })
+                for offset in range(0, return_limit, SOCRATA_PAGE_SIZE)
+            ))
+            data = list(itertools.chain.from_iterable(paginas))
+        else:
+            data = await cls._consultar_filas(data_params)
+        
+        _FILAS_CACHE[filas_key] = data
+        return data
+    
+    @classmethod
+    async def _get_socrata(cls, params: Dict[str, Any], error: str) -> httpx.Response:
+        """GET a datos.gov.co con el cliente compartido.
+        
+        Args:
+            params: Parámetros SoQL de la consulta
+            error: Mensaje de error para la respuesta HTTP
+        
+        Returns:
+            httpx.Response: Respuesta con estado 200
+        
+        Raises:
+            HTTPException: 504 si se agota el tiempo, 503 si falla la conexión,
+                500 si la API responde con un estado distinto de 200
+        """
+        try:
+            response = await cls._obtener_cliente_http().get(BASE_URL, params=params)
+        except httpx.HTTPError as e:
+            logger.error("❌ Error consultando datos.gov.co: %s", e)
+            raise HTTPException(
+                status_code=504 if isinstance(e, httpx.TimeoutException) else 503,
+                detail={
+                    "error": error,
+                    "status_code": None,
+                    "message": f"Sin respuesta de la API de datos.gov.co ({type(e).__name__})"
+                }
+            ) from e
+        
+        if response.status_code != 200:
             raise HTTPException(
                 status_code=500,
                 detail={
-                    "error": "No se pudo obtener la información de contratos",
-                    "status_code": data_response.status_code,
+                    "error": error,
+                    "status_code": response.status_code,
                     "message": "Error en la comunicación con la API de datos.gov.co"
                 }
             )
-
-        data = data_response.json()
-
+        
+        return response
+    
+    @classmethod
+    async def _consultar_filas(cls, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Ejecuta una consulta SoQL del listado y decodifica las filas.
+        
+        Args:
+            params: Parámetros SoQL ($limit, $order, $where, $offset)
+        
+        Returns:
+            list: Filas devueltas por la API
+        
+        Raises:
+            HTTPException: Si hay error en la comunicación con la API externa
+        """
+        data_response = await cls._get_socrata(params, "No se pudo obtener la información de contratos")
+        return orjson.loads(data_response.content)
+    
+    @classmethod
+    def _analizar_muestra(
+        cls,
+        data: List[Dict[str, Any]],
+        where_clause: str,
+        filtro_hash: str,
+        return_limit: int
+    ) -> tuple[int, float, int, List[ContratoDetalleModel]]:
+        """Analiza con el motor ML una muestra de contratos y actualiza el caché.
+        
+        Args:
+            data: Contratos obtenidos de la API externa
+            where_clause: Cláusula WHERE de SoQL del usuario (para el caché)
+            filtro_hash: Hash de filtros usado como llave de estadísticas
+            return_limit: Número máximo de contratos a devolver
+        
+        Returns:
+            tuple: (total_contratos_muestra, monto_total_muestra, contratos_alto_riesgo, contratos_mapeados)
+        """
         # Mapear contratos con análisis real del motor
         contratos_mapeados = []
-        contratos_alto_riesgo_reales = 0
         
         try:
             motor = cls._obtener_motor()
-            print(f"✓ Motor ML obtenido, analizando {len(data)} contratos (sin LLM para rapidez)...")
+            logger.debug("✓ Motor ML obtenido, analizando %d contratos (sin LLM para rapidez)...", len(data))
         except Exception as e:
-            print(f"❌ Error obteniendo motor: {e}")
+            logger.error("❌ Error obteniendo motor: %s", e)
             raise
         
-        for idx, contrato in enumerate(data, 1):
+        # Estandarizar todas las descripciones del lote de una vez
+        descripciones = estandarizar_textos(c.get("objeto_del_contrato", "") for c in data)
+        
+        # 1. Filtrar contratos válidos y preparar sus datos para el motor
+        validos = []
+        for idx, (contrato, descripcion_estandarizada) in enumerate(zip(data, descripciones), 1):
             descripcion_original = contrato.get("objeto_del_contrato", "")
-            descripcion_estandarizada = estandarizar_texto(descripcion_original)
             
             # Validación adicional de calidad (por si la API devuelve datos inválidos)
             valor = float(contrato.get("valor_del_contrato", 0))
-            fecha_inicio = contrato.get("fecha_de_inicio_del_contrato", "")
             
             # Skip contratos que no pasaron filtros pero llegaron igual
             if valor <= 0 or valor > 50000000000:
-                print(f"   ⚠️ Omitido [{idx}/{len(data)}]: Valor inválido (${valor:,.0f})")
+                logger.debug("   ⚠️ Omitido [%d/%d]: Valor inválido ($%.0f)", idx, len(data), valor)
                 continue
             
             if not descripcion_original or len(descripcion_original) <= 10:
-                print(f"   ⚠️ Omitido [{idx}/{len(data)}]: Descripción vacía o muy corta")
+                logger.debug("   ⚠️ Omitido [%d/%d]: Descripción vacía o muy corta", idx, len(data))
                 continue
             
-            # Preparar datos y ejecutar análisis (solo ML, sin LLM)
             try:
                 datos_motor = cls._preparar_datos_para_motor(contrato)
-                resultado_ml = motor.analizar_contrato_ml_solo(datos_motor)
+            except Exception as e:
+                logger.warning("   ❌ Error: %s: %.100s", contrato.get("id_contrato", "N/A"), e)
+                datos_motor = None
+            validos.append((contrato, descripcion_estandarizada, datos_motor))
+        
+        # 2. Análisis ML de todo el lote en una sola llamada (embeddings, IsolationForest; sin SHAP ni LLM)
+        lote = [datos_motor for _, _, datos_motor in validos if datos_motor is not None]
+        try:
+            resultados_lote = iter(motor.analizar_lote(lote, incluir_shap=False))
+        except Exception as e:
+            logger.warning("   ❌ Error en análisis por lotes, se analiza contrato por contrato: %.100s", e)
+            resultados_lote = None
+        
+        # 3. Mapear resultados en el orden original
+        for idx, (contrato, descripcion_estandarizada, datos_motor) in enumerate(validos, 1):
+            try:
+                if datos_motor is None:
+                    raise ValueError("datos del contrato no preparados")
+                if resultados_lote is not None:
+                    resultado_ml = next(resultados_lote)
+                else:
+                    resultado_ml = motor.analizar_contrato_ml_solo(datos_motor)
                 
                 # Extraer métricas del análisis
                 metadata = resultado_ml.get("Meta_Data", {})
@@ -396,32 +655,34 @@ class ContractService:
                 # Mapear nivel de riesgo
                 nivel_riesgo = cls._mapear_nivel_riesgo(nivel)
                 
-                # Contar contratos de alto riesgo reales
-                if nivel_riesgo == NivelRiesgo.ALTO:
-                    contratos_alto_riesgo_reales += 1
-                
-                print(f"   ✓ [{idx}/{len(data)}] {contrato.get('id_contrato', 'N/A')}: {anomalia_porcentaje}% ({nivel})")
+                logger.debug(
+                    "   ✓ [%d/%d] %s: %s%% (%s)",
+                    idx, len(validos), contrato.get("id_contrato", "N/A"), anomalia_porcentaje, nivel
+                )
                 
             except Exception as e:
-                print(f"   ❌ Error: {contrato.get('id_contrato', 'N/A')}: {str(e)[:100]}")
+                logger.warning("   ❌ Error: %s: %.100s", contrato.get("id_contrato", "N/A"), e)
                 # Fallback a valores por defecto si falla el análisis
                 anomalia_porcentaje = 0.0
                 nivel_riesgo = NivelRiesgo.SIN_ANALISIS
             
-            contratos_mapeados.append(ContratoDetalleModel(
-                Contrato=ContratoInfoModel(
+            # Campos construidos por nosotros: se omite la validación de Pydantic
+            contratos_mapeados.append(ContratoDetalleModel.model_construct(
+                Contrato=ContratoInfoModel.model_construct(
                     Codigo=contrato.get("id_contrato", ""),
                     Descripcion=descripcion_estandarizada
                 ),
                 Entidad=contrato.get("nombre_entidad", ""),
-                Monto=contrato.get("valor_del_contrato", "0"),
+                Monto=str(contrato.get("valor_del_contrato", "0")),
                 FechaInicio=contrato.get("fecha_de_inicio_del_contrato"),
                 NivelRiesgo=nivel_riesgo,
                 Anomalia=anomalia_porcentaje
             ))
         
-        # Calcular estadísticas de la muestra
+        # Calcular estadísticas de la muestra (conteo por nivel en una sola pasada)
         total_analizados = len(contratos_mapeados)
+        contratos_por_nivel = Counter(c.NivelRiesgo for c in contratos_mapeados)
+        contratos_alto_riesgo_reales = contratos_por_nivel[NivelRiesgo.ALTO]
         porcentaje_alto_riesgo = (contratos_alto_riesgo_reales / total_analizados * 100) if total_analizados > 0 else 0
         
         # Calcular monto total de la muestra
@@ -431,15 +692,15 @@ class ContractService:
             if c.Monto
         )
         
-        print(f"\n📈 ESTADÍSTICAS DE MUESTRA ({return_limit} contratos):")
-        print(f"   Total contratos analizados: {total_analizados:,}")
-        print(f"   Contratos alto riesgo: {contratos_alto_riesgo_reales:,}")
-        print(f"   Porcentaje alto riesgo: {porcentaje_alto_riesgo:.2f}%")
-        print(f"   Monto total muestra: ${monto_total:,.2f} COP")
+        logger.debug("📈 ESTADÍSTICAS DE MUESTRA (%d contratos):", return_limit)
+        logger.debug("   Total contratos analizados: %d", total_analizados)
+        logger.debug("   Contratos alto riesgo: %d", contratos_alto_riesgo_reales)
+        logger.debug("   Porcentaje alto riesgo: %.2f%%", porcentaje_alto_riesgo)
+        logger.debug("   Monto total muestra: $%.2f COP", monto_total)
         
         # ==================== GUARDAR EN CACHÉ ====================
         if cache_service.is_enabled:
-            print(f"\n💾 Guardando resultados en caché...")
+            logger.debug("💾 Guardando resultados en caché...")
             
             # Preparar datos para batch insert de análisis ligero
             analisis_batch = []
@@ -458,64 +719,103 @@ class ContractService:
             # Guardar análisis ligero en batch
             cache_service.save_analisis_ligero_batch(analisis_batch)
             
-            # Calcular contratos por nivel de riesgo
-            contratos_medio = sum(1 for c in contratos_mapeados if c.NivelRiesgo == NivelRiesgo.MEDIO)
-            contratos_bajo = sum(1 for c in contratos_mapeados if c.NivelRiesgo == NivelRiesgo.BAJO)
-            
             # Guardar estadísticas globales
             cache_service.save_estadisticas(
                 filtro_hash=filtro_hash,
                 filtro_descripcion=where_clause[:200] if where_clause else "Sin filtros",
                 total_contratos=total_analizados,
                 contratos_alto_riesgo=contratos_alto_riesgo_reales,
-                contratos_medio_riesgo=contratos_medio,
-                contratos_bajo_riesgo=contratos_bajo,
+                contratos_medio_riesgo=contratos_por_nivel[NivelRiesgo.MEDIO],
+                contratos_bajo_riesgo=contratos_por_nivel[NivelRiesgo.BAJO],
                 porcentaje_alto_riesgo=porcentaje_alto_riesgo,
                 monto_total_cop=monto_total
             )
             
-            print(f"✅ Caché actualizado: {len(analisis_batch)} contratos + estadísticas")
+            logger.debug("✅ Caché actualizado: %d contratos + estadísticas", len(analisis_batch))
         
-        print(f"\n✅ Análisis completado. Devolviendo primeros {min(return_limit, len(contratos_mapeados))} contratos\n")
+        logger.debug("✅ Análisis completado. Devolviendo primeros %d contratos", min(return_limit, len(contratos_mapeados)))
 
         # Devolver solo los primeros return_limit contratos (ya ordenados por fecha DESC)
         contratos_a_devolver = contratos_mapeados[:return_limit]
         
         return total_analizados, monto_total, contratos_alto_riesgo_reales, contratos_a_devolver
 
-    @staticmethod
-    def obtener_contrato_por_id(contract_id: str) -> Dict[str, Any]:
-        """Obtiene un contrato específico por su ID.
+    @classmethod
+    async def obtener_contratos_por_ids(
+        cls,
+        ids: List[str],
+        forzar_refresco: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """Obtiene varios contratos por ID en una sola consulta a la API.
+        
+        Usa `id_contrato in (...)` para resolver todos los IDs en un único
+        round-trip en lugar de una petición por contrato.
+        
+        Los contratos encontrados se guardan en un caché en proceso con TTL,
+        de modo que solo se consultan a la API los IDs que no estén en él.
         
         Args:
-            contract_id: ID del contrato a buscar
-            
+            ids: Lista de IDs de contratos a buscar
+            forzar_refresco: Si es True, ignora el caché y consulta todos los IDs
+        
         Returns:
-            dict: Datos del contrato
-            
+            dict: Contratos encontrados indexados por id_contrato
+        
         Raises:
-            HTTPException: Si el contrato no existe o hay error en la API
+            HTTPException: Si hay error en la comunicación con la API
         """
+        contratos = {}
+        ids_unicos = list(dict.fromkeys(ids))
+        
+        if not forzar_refresco:
+            with _CONTRATOS_CACHE_LOCK:
+                for id_contrato in ids_unicos:
+                    contrato = _CONTRATOS_CACHE.get(id_contrato)
+                    if contrato is not None:
+                        contratos[id_contrato] = contrato
+            ids_unicos = [id_contrato for id_contrato in ids_unicos if id_contrato not in contratos]
+        
+        if not ids_unicos:
+            return contratos
+        
+        # Literales escapados y en orden canónico: mismos IDs -> misma URL
         params = {
-            "$where": f"id_contrato = '{contract_id}'",
-            "$limit": 1
+            "$where": soql_where_in("id_contrato", sorted(ids_unicos)),
+            # Holgura: un id_contrato puede venir repetido (se deduplica abajo) sin recortar otros IDs
+            "$limit": max(len(ids_unicos) * 2, 50)
         }
         
-        response = requests.get(BASE_URL, params=params)
+        response = await cls._get_socrata(params, "No se pudo obtener la información del contrato")
         
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "No se pudo obtener la información del contrato",
-                    "status_code": response.status_code,
-                    "message": "Error en la comunicación con la API de datos.gov.co"
-                }
-            )
+        encontrados = {}
+        for contrato in orjson.loads(response.content):
+            id_contrato = contrato.get("id_contrato")
+            if id_contrato and id_contrato not in encontrados:
+                encontrados[id_contrato] = contrato
         
-        data = response.json()
+        with _CONTRATOS_CACHE_LOCK:
+            _CONTRATOS_CACHE.update(encontrados)
+        contratos.update(encontrados)
         
-        if not data or len(data) == 0:
+        return contratos
+    
+    @classmethod
+    async def obtener_contrato_por_id(cls, contract_id: str, forzar_refresco: bool = False) -> Dict[str, Any]:
+        """Obtiene un contrato específico por su ID.
+        
+        Args:
+            contract_id: ID del contrato a buscar
+            forzar_refresco: Si es True, ignora el caché en proceso
+        
+        Returns:
+            dict: Datos del contrato
+        
+        Raises:
+            HTTPException: Si el contrato no existe o hay error en la API
+        """
+        data = await cls.obtener_contratos_por_ids([contract_id], forzar_refresco=forzar_refresco)
+        
+        if contract_id not in data:
             raise HTTPException(
                 status_code=404,
                 detail={
@@ -525,19 +825,25 @@ class ContractService:
                 }
             )
         
-        return data[0]
+        return data[contract_id]
 
     @classmethod
-    def generar_analisis_contrato(
+    async def generar_analisis_contrato(
         cls,
         contract_id: str,
-        contrato: Dict[str, Any]
+        contrato: Dict[str, Any],
+        background_tasks: Optional[BackgroundTasks] = None
     ) -> tuple[ContractDetailModel, AnalysisModel]:
         """Genera análisis detallado de un contrato usando el motor de ML e IA.
         
+        El análisis del motor (ML + LLM) se ejecuta en un hilo para no bloquear
+        el event loop mientras se espera la respuesta del LLM.
+        
         Args:
             contract_id: ID del contrato
             contrato: Datos del contrato de la API
+            background_tasks: Tareas de fondo de FastAPI. Si se indica, el
+                guardado en caché se ejecuta después de enviar la respuesta
             
         Raises:
             HTTPException: Si el contrato tiene datos inválidos
@@ -591,10 +897,10 @@ class ContractService:
                 )
         
         # ==================== VERIFICAR CACHÉ ====================
-        cached_detallado = cache_service.get_analisis_detallado(contract_id)
+        cached_detallado = await asyncio.to_thread(cache_service.get_analisis_detallado, contract_id)
         
         if cached_detallado and cache_service.is_enabled:
-            print(f"✅ Análisis detallado recuperado del caché: {contract_id}")
+            logger.debug("✅ Análisis detallado recuperado del caché: %s", contract_id)
             
             # Reconstruir objetos desde caché
             descripcion_estandarizada = estandarizar_texto(contrato.get("objeto_del_contrato", ""))
@@ -609,13 +915,14 @@ class ContractService:
             shap_values = []
             try:
                 cached_shap = cached_detallado.get("shap_values", [])
-                logger.debug(f"Reconstruyendo {len(cached_shap)} SHAP values desde caché")
+                logger.debug("Reconstruyendo %d SHAP values desde caché", len(cached_shap))
                 
                 for sv in cached_shap:
                     if isinstance(sv, dict):
                         # Validar campos requeridos
                         variable = sv.get("variable", "unknown")
-                        valor = sv.get("valor", 0.0)
+                        # Entradas antiguas guardaban el peso como "valor"
+                        valor = sv.get("value", sv.get("valor", 0.0))
                         
                         shap_values.append(ShapValueModel(
                             variable=str(variable),
@@ -624,10 +931,10 @@ class ContractService:
                             actualValue=sv.get("actualValue", "Desde caché")
                         ))
                     else:
-                        logger.warning(f"SHAP value inválido en caché: {sv}")
+                        logger.warning("SHAP value inválido en caché: %s", sv)
                         
             except Exception as e:
-                logger.error(f"Error reconstruyendo SHAP values desde caché: {e}")
+                logger.error("Error reconstruyendo SHAP values desde caché: %s", e)
                 shap_values = []
             
             # Construir modelos de respuesta
@@ -649,8 +956,8 @@ class ContractService:
                 recomendaciones=cached_detallado.get("recomendaciones", ["Verificar datos actualizados"]),
                 shapValues=shap_values,
                 probabilidadBase=round(cached_detallado.get("score_final", 0) * 80, 1),
-                confianza=85.0,  # Confianza del caché
-                fechaAnalisis=cached_detallado.get("fecha_analisis", datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"))
+                confianza=_CONFIANZA_CACHE,
+                fechaAnalisis=cached_detallado.get("fecha_analisis") or _fecha_analisis_utc()
             )
             
             return contract_detail, analysis
@@ -667,14 +974,14 @@ class ContractService:
         # ============================================
         # ANÁLISIS REAL CON MOTOR DE IA
         # ============================================
-        logger.info(f"\n{'='*80}")
-        logger.info(f"INICIANDO ANÁLISIS DE CONTRATO: {contract_id}")
-        logger.info(f"{'='*80}")
+        logger.info("\n%s", _SEPARADOR_LOG)
+        logger.info("INICIANDO ANÁLISIS DE CONTRATO: %s", contract_id)
+        logger.info(_SEPARADOR_LOG)
         
         try:
-            # Obtener instancia del motor
-            motor = cls._obtener_motor()
-            logger.info(f"✅ Motor obtenido - LLM disponible: {motor.usar_llm}")
+            # Obtener instancia del motor (la primera carga de modelos es bloqueante)
+            motor = await asyncio.to_thread(cls._obtener_motor)
+            logger.info("✅ Motor obtenido - LLM disponible: %s", motor.usar_llm)
             
             # Preparar datos para el motor
             logger.info("📊 Preparando datos del contrato...")
@@ -682,21 +989,21 @@ class ContractService:
             
             # Ejecutar análisis completo con ML + LLM
             logger.info("🧠 Ejecutando análisis completo con motor RadarColInferencia (ML + LLM)...")
-            logger.info(f"   Parámetros: incluir_llm=True, motor.usar_llm={motor.usar_llm}")
+            logger.info("   Parámetros: incluir_llm=True, motor.usar_llm=%s", motor.usar_llm)
             
-            resultado_analisis = motor.analizar_contrato(datos_motor, incluir_llm=True)
+            resultado_analisis = await motor.analizar_contrato_async(datos_motor)
             
             # LOGUEAR RESPUESTA COMPLETA DEL MOTOR
-            logger.info("="*80)
+            logger.info(_SEPARADOR_LOG)
             logger.info("RESPUESTA COMPLETA DEL MOTOR:")
-            logger.info("="*80)
-            import json
-            logger.info(json.dumps(resultado_analisis, indent=2, ensure_ascii=False))
-            logger.info("="*80)
+            logger.info(_SEPARADOR_LOG)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps(resultado_analisis, indent=2, ensure_ascii=False))
+            logger.info(_SEPARADOR_LOG)
             
             # Log del resultado completo
             logger.info("Análisis completado. Procesando resultados...")
-            logger.debug(f"📦 Claves en resultado: {list(resultado_analisis.keys())}")
+            logger.debug("📦 Claves en resultado: %s", resultado_analisis.keys())
             
             # Extraer resultados del análisis ML + LLM
             meta_data = resultado_analisis["Meta_Data"]
@@ -704,148 +1011,188 @@ class ContractService:
             anomalia = meta_data["Score"] * 100  # Convertir a porcentaje
             nivel_riesgo = cls._mapear_nivel_riesgo(nivel_riesgo_str)
             
-            logger.info(f"Nivel de Riesgo Detectado: {nivel_riesgo_str} ({anomalia:.1f}%)")
+            logger.info("Nivel de Riesgo Detectado: %s (%.1f%%)", nivel_riesgo_str, anomalia)
             
             # Extraer análisis LLM (si está disponible)
             analisis_llm = resultado_analisis.get("Analisis_LLM", {})
-            logger.info(f"🔍 Análisis LLM presente: {bool(analisis_llm)}")
+            logger.info("🔍 Análisis LLM presente: %s", bool(analisis_llm))
             
             if analisis_llm:
-                logger.info(f"   Claves LLM: {list(analisis_llm.keys())}")
+                logger.info("   Claves LLM: %s", analisis_llm.keys())
                 resumen_llm = analisis_llm.get("resumen", "")
-                logger.info(f"   Longitud resumen: {len(resumen_llm)} chars")
-                logger.info(f"   Extracto resumen: {resumen_llm[:100]}...")
+                logger.info("   Longitud resumen: %d chars", len(resumen_llm))
+                logger.info("   Extracto resumen: %.100s...", resumen_llm)
             
             resumen_ejecutivo = analisis_llm.get("resumen", "Análisis ML completado")
             factores_principales = analisis_llm.get("factores", [])
             recomendaciones = analisis_llm.get("recomendaciones", [])
             detalle_shap = resultado_analisis.get("Detalle_SHAP", [])
             
-            logger.info(f"Factores principales encontrados: {len(factores_principales)}")
-            logger.info(f"Recomendaciones generadas: {len(recomendaciones)}")
-            logger.info(f"Valores SHAP disponibles: {len(detalle_shap)}")
+            logger.info("Factores principales encontrados: %d", len(factores_principales))
+            logger.info("Recomendaciones generadas: %d", len(recomendaciones))
+            logger.info("Valores SHAP disponibles: %d", len(detalle_shap))
             
-            if detalle_shap:
+            if detalle_shap and logger.isEnabledFor(logging.DEBUG):
                 logger.debug("Detalle SHAP:")
-                for item in detalle_shap[:3]:  # Mostrar solo los primeros 3
-                    logger.debug(f"   • {item.get('variable', 'N/A')}: {item.get('valor', 0):.4f}")
+                for item in itertools.islice(detalle_shap, 3):  # Mostrar solo los primeros 3
+                    logger.debug("   • %s: %.4f", item.get("variable", "N/A"), item.get("valor", 0))
             
         except Exception as e:
             # Fallback en caso de error del motor
-            logger.error(f"ERROR en motor de análisis: {type(e).__name__}")
-            logger.error(f"   Mensaje: {str(e)}")
-            logger.error(f"   Contrato ID: {contract_id}")
+            logger.error("ERROR en motor de análisis: %s", type(e).__name__)
+            logger.error("   Mensaje: %s", e)
+            logger.error("   Contrato ID: %s", contract_id)
             logger.warning("Activando modo de contingencia con valores por defecto")
             
             nivel_riesgo = NivelRiesgo.MEDIO
             anomalia = 50.0
-            resumen_ejecutivo = f"Análisis del contrato {contract_id}. El motor de análisis no está disponible temporalmente."
-            factores_principales = ["Análisis en modo de contingencia"]
-            recomendaciones = ["Verificar configuración del sistema de análisis"]
+            resumen_ejecutivo = _RESUMEN_CONTINGENCIA.format(contract_id=contract_id)
+            factores_principales = list(_FACTORES_CONTINGENCIA)
+            recomendaciones = list(_RECOMENDACIONES_CONTINGENCIA)
             detalle_shap = []
+            resultado_analisis = None
         
-        # Datos del contrato
-        contract_data = ContractDetailModel(
+        # Datos del contrato (construidos internamente: se omite la validación de Pydantic)
+        contract_data = ContractDetailModel.model_construct(
             id=contract_id,
             codigo=contrato.get("id_contrato", contract_id),
             descripcion=descripcion_estandarizada,
-            entidad=contrato.get("nombre_entidad", "Entidad no especificada"),
+            entidad=contrato.get("nombre_entidad") or "Entidad no especificada",
             monto=str(monto),
             fechaInicio=fecha_inicio,
             nivelRiesgo=nivel_riesgo,
-            anomalia=round(anomalia, 2)
+            anomalia=round(float(anomalia), 2)
         )
         
         # Construir valores SHAP desde el detalle del motor
         logger.info("🔧 Construyendo valores SHAP para respuesta...")
-        logger.debug(f"   Detalle SHAP recibido: {len(detalle_shap)} items")
+        logger.debug("   Detalle SHAP recibido: %d items", len(detalle_shap))
         
         shap_values = []
         try:
             if detalle_shap and isinstance(detalle_shap, list):
                 shap_values = cls._construir_shap_values(detalle_shap, contrato)
             else:
-                logger.warning(f"Detalle SHAP inválido: {type(detalle_shap)}")
+                logger.warning("Detalle SHAP inválido: %s", type(detalle_shap))
         except Exception as e:
-            logger.error(f"Error construyendo SHAP values: {e}")
-            logger.error(f"   Tipo detalle_shap: {type(detalle_shap)}")
-            logger.error(f"   Contenido detalle_shap: {detalle_shap}")
+            logger.error("Error construyendo SHAP values: %s", e)
+            logger.error("   Tipo detalle_shap: %s", type(detalle_shap))
+            logger.error("   Contenido detalle_shap: %s", detalle_shap)
             shap_values = []
             
-        logger.info(f"✅ SHAP values construidos: {len(shap_values)} variables")
+        logger.info("✅ SHAP values construidos: %d variables", len(shap_values))
         
-        if shap_values:
-            logger.debug("Variables SHAP principales:")
-            for sv in shap_values[:3]:
-                logger.debug(f"   • {sv.variable}: {sv.value} ({sv.description})")
-        else:
+        if not shap_values:
             logger.warning("No se generaron valores SHAP")
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Variables SHAP principales:")
+            for sv in itertools.islice(shap_values, 3):
+                logger.debug("   • %s: %s (%s)", sv.variable, sv.value, sv.description)
         
         # Análisis con datos reales del motor
-        analysis_data = AnalysisModel(
+        analysis_data = AnalysisModel.model_construct(
             contractId=contract_id,
-            resumenEjecutivo=resumen_ejecutivo,
+            resumenEjecutivo=str(resumen_ejecutivo),
             factoresPrincipales=factores_principales,
             recomendaciones=recomendaciones,
             shapValues=shap_values,
-            probabilidadBase=round(anomalia * 0.8, 1),  # Base calculada como 80% del score
-            confianza=87.5,  # Confianza del modelo (puede ajustarse)
-            fechaAnalisis=datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+            probabilidadBase=round(float(anomalia) * 0.8, 1),  # Base calculada como 80% del score
+            confianza=_CONFIANZA_MODELO,
+            fechaAnalisis=_fecha_analisis_utc()
         )
         
-        logger.info(f"\n{'='*80}")
-        logger.info(f"ANÁLISIS COMPLETADO EXITOSAMENTE")
-        logger.info(f"   Contrato: {contract_id}")
-        logger.info(f"   Nivel Riesgo: {nivel_riesgo.value}")
-        logger.info(f"   Anomalía: {anomalia:.1f}%")
-        logger.info(f"   SHAP Values: {len(shap_values)}")
-        logger.info(f"{'='*80}\n")
+        logger.info("\n%s", _SEPARADOR_LOG)
+        logger.info("ANÁLISIS COMPLETADO EXITOSAMENTE")
+        logger.info("   Contrato: %s", contract_id)
+        logger.info("   Nivel Riesgo: %s", nivel_riesgo.value)
+        logger.info("   Anomalía: %.1f%%", anomalia)
+        logger.info("   SHAP Values: %d", len(shap_values))
+        logger.info("%s\n", _SEPARADOR_LOG)
         
         # ==================== GUARDAR EN CACHÉ ====================
-        if cache_service.is_enabled:
-            print(f"💾 Guardando análisis detallado en caché: {contract_id}")
+        # Se omite en modo de contingencia para no cachear valores por defecto
+        if cache_service.is_enabled and resultado_analisis is not None:
+            argumentos_cache = (
+                contract_id,
+                contrato,
+                resumen_ejecutivo,
+                factores_principales,
+                recomendaciones,
+                shap_values,
+                anomalia,
+                nivel_riesgo,
+                resultado_analisis.get("Meta_Data", {})
+            )
+            if background_tasks is not None:
+                # La escritura se ejecuta después de enviar la respuesta
+                background_tasks.add_task(cls._guardar_analisis_en_cache, *argumentos_cache)
+            else:
+                cls._guardar_analisis_en_cache(*argumentos_cache)
+        
+        return contract_data, analysis_data
+    
+    @staticmethod
+    def _guardar_analisis_en_cache(
+        contract_id: str,
+        contrato: Dict[str, Any],
+        resumen_ejecutivo: str,
+        factores_principales: List[str],
+        recomendaciones: List[str],
+        shap_values: List[ShapValueModel],
+        anomalia: float,
+        nivel_riesgo: NivelRiesgo,
+        meta_data: Dict[str, Any]
+    ) -> None:
+        """Guarda el análisis detallado (y el ligero si no existe) en caché.
+        
+        Args:
+            contract_id: ID del contrato
+            contrato: Datos del contrato de la API
+            resumen_ejecutivo: Resumen generado por el motor
+            factores_principales: Factores principales del análisis
+            recomendaciones: Recomendaciones del análisis
+            shap_values: Valores SHAP construidos para la respuesta
+            anomalia: Score de anomalía en porcentaje (0-100)
+            nivel_riesgo: Nivel de riesgo mapeado
+            meta_data: Meta_Data devuelta por el motor
+        """
+        monto = contrato.get("valor_del_contrato", "0")
+        fecha_inicio = contrato.get("fecha_de_inicio_del_contrato")
+        
+        logger.debug("💾 Guardando análisis detallado en caché: %s", contract_id)
+        
+        try:
+            # Guardar análisis detallado
+            cache_service.save_analisis_detallado(
+                id_contrato=contract_id,
+                resumen_ejecutivo=resumen_ejecutivo,
+                factores_principales=factores_principales,
+                recomendaciones=recomendaciones,
+                shap_values=shap_values,
+                score_final=anomalia / 100.0,  # Convertir de % a 0-1
+                score_isolation_forest=meta_data.get("Score", 0),
+                score_nlp_embeddings=0.0,  # Extraer si está disponible
+                isolation_forest_raw=meta_data.get("Score", 0),
+                distancia_semantica=0.0,  # Extraer si está disponible
+                meta_data=meta_data,
+                duracion_analisis_ms=0  # Podemos medir esto si queremos
+            )
             
-            try:
-                # Guardar análisis detallado
-                cache_service.save_analisis_detallado(
+            # Asegurar que también exista análisis ligero
+            cached_ligero = cache_service.get_analisis_ligero(contract_id)
+            if not cached_ligero:
+                cache_service.save_analisis_ligero(
                     id_contrato=contract_id,
-                    resumen_ejecutivo=resumen_ejecutivo,
-                    factores_principales=factores_principales,
-                    recomendaciones=recomendaciones,
-                    shap_values=[
-                        {
-                            "variable": sv.variable,
-                            "valor": sv.value,
-                            "description": sv.description,
-                            "actualValue": sv.actualValue
-                        } for sv in shap_values
-                    ],
-                    score_final=anomalia / 100.0,  # Convertir de % a 0-1
-                    score_isolation_forest=resultado_analisis.get("Meta_Data", {}).get("Score", 0),
-                    score_nlp_embeddings=0.0,  # Extraer si está disponible
-                    isolation_forest_raw=resultado_analisis.get("Meta_Data", {}).get("Score", 0),
-                    distancia_semantica=0.0,  # Extraer si está disponible
-                    meta_data=resultado_analisis.get("Meta_Data", {}),
-                    duracion_analisis_ms=0  # Podemos medir esto si queremos
+                    nombre_entidad=contrato.get("nombre_entidad", ""),
+                    valor_contrato=float(monto),
+                    fecha_inicio=fecha_inicio,
+                    nivel_riesgo=nivel_riesgo.value,
+                    anomalia=anomalia,
+                    score_isolation_forest=meta_data.get("Score", 0),
+                    score_nlp_embeddings=0.0
                 )
-                
-                # Asegurar que también exista análisis ligero
-                cached_ligero = cache_service.get_analisis_ligero(contract_id)
-                if not cached_ligero:
-                    cache_service.save_analisis_ligero(
-                        id_contrato=contract_id,
-                        nombre_entidad=contrato.get("nombre_entidad", ""),
-                        valor_contrato=float(monto),
-                        fecha_inicio=fecha_inicio,
-                        nivel_riesgo=nivel_riesgo.value,
-                        anomalia=anomalia,
-                        score_isolation_forest=resultado_analisis.get("Meta_Data", {}).get("Score", 0),
-                        score_nlp_embeddings=0.0
-                    )
-                    print(f"   + Análisis ligero también guardado")
-                
-                print(f"✅ Análisis guardado en caché correctamente")
-            except Exception as e:
-                print(f"⚠️ Error guardando en caché: {e}")
-        
-        return contract_data, analysis_data
+                logger.debug("   + Análisis ligero también guardado")
+            
+            logger.debug("✅ Análisis guardado en caché correctamente")
+        except Exception as e:
+            logger.warning("⚠️ Error guardando en caché: %s", e)
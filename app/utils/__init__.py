@@ -1,4 +1,11 @@
 """Archivo de inicialización del módulo utils."""
-from .text_formatter import estandarizar_texto
+from .text_formatter import estandarizar_texto, estandarizar_textos
+from .soql import soql_literal, soql_where_eq, soql_where_in
 
-__all__ = ["estandarizar_texto"]
+__all__ = [
+    "estandarizar_texto",
+    "estandarizar_textos",
+    "soql_literal",
+    "soql_where_eq",
+    "soql_where_in"
+]
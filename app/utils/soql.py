@@ -0,0 +1,45 @@
+"""
+Utilidades para construir cláusulas SoQL (API de datos.gov.co).
+"""
+from typing import Iterable
+
+
+def soql_literal(valor: str) -> str:
+    """Convierte un valor en un literal de texto SoQL escapado.
+    
+    Las comillas simples se duplican (`'` -> `''`), de modo que el valor no
+    puede cerrar el literal ni inyectar condiciones adicionales.
+    
+    Args:
+        valor (str): Valor a convertir
+    
+    Returns:
+        str: Literal SoQL entre comillas simples
+    """
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def soql_where_eq(campo: str, valor: str) -> str:
+    """Construye la condición canónica `campo = 'valor'`.
+    
+    Args:
+        campo (str): Nombre del campo SoQL
+        valor (str): Valor a comparar
+    
+    Returns:
+        str: Condición SoQL escapada
+    """
+    return f"{campo} = {soql_literal(valor)}"
+
+
+def soql_where_in(campo: str, valores: Iterable[str]) -> str:
+    """Construye la condición canónica `campo in ('a','b',...)`.
+    
+    Args:
+        campo (str): Nombre del campo SoQL
+        valores (Iterable[str]): Valores permitidos
+    
+    Returns:
+        str: Condición SoQL escapada
+    """
+    return f"{campo} in ({','.join(soql_literal(valor) for valor in valores)})"
@@ -1,7 +1,41 @@
 """
 Utilidades de formateo de texto.
 """
-import re
+from functools import lru_cache
+from typing import Iterable, List
+
+# Separadores de oración en bytes para el recorrido sobre UTF-8
+_SEPARADORES_ORACION = (b". ", b"; ", b": ")
+
+
+def _capitalizar_oraciones(texto: str) -> str:
+    """Capitaliza la letra que sigue a '. ', '; ' o ': ' en texto con espacios simples.
+    
+    Busca cada separador con `bytearray.find` (primitivas en C, sin motor de
+    regex) sobre el texto codificado en UTF-8 y modifica los bytes en sitio.
+    En UTF-8 los caracteres multibyte (tildes, eñes) nunca contienen bytes
+    ASCII, así que el recorrido es válido para cualquier texto.
+    
+    Args:
+        texto (str): Texto ya normalizado (sin espacios múltiples) y en minúsculas
+        
+    Returns:
+        str: Texto con inicios de oración capitalizados
+    """
+    if ". " not in texto and "; " not in texto and ": " not in texto:
+        return texto
+    
+    buf = bytearray(texto, "utf-8")
+    n = len(buf)
+    for separador in _SEPARADORES_ORACION:
+        i = buf.find(separador)
+        while i != -1:
+            j = i + 2
+            # 97..122 = 'a'..'z'; restar 32 la convierte en mayúscula
+            if j < n and 97 <= buf[j] <= 122:
+                buf[j] -= 32
+            i = buf.find(separador, j)
+    return buf.decode("utf-8")
 
 
 def estandarizar_texto(texto: str) -> str:
@@ -23,9 +57,20 @@ def estandarizar_texto(texto: str) -> str:
     if not texto or not isinstance(texto, str):
         return ""
     
+    # Solo cadenas (hashables) llegan a la versión memoizada
+    return _estandarizar_texto_cached(texto)
+
+
+@lru_cache(maxsize=20_000)
+def _estandarizar_texto_cached(texto: str) -> str:
+    """Implementación memoizada de `estandarizar_texto` para cadenas no vacías.
+    
+    Muchas descripciones de SECOP se repiten textualmente entre contratos y
+    entre consultas, así que las repeticiones se resuelven en O(1).
+    """
     # Limpiar el texto: eliminar saltos de línea extra y espacios múltiples
+    # (split() sin argumentos ya descarta los espacios de los extremos)
     texto = " ".join(texto.split())
-    texto = texto.strip()
     
     if not texto:
         return ""
@@ -36,16 +81,22 @@ def estandarizar_texto(texto: str) -> str:
     # Capitalizar primera letra
     texto = texto[0].upper() + texto[1:] if len(texto) > 1 else texto.upper()
     
-    # Capitalizar después de puntos seguidos de espacio
-    patron_punto = r'\. +([a-z])'
-    texto = re.sub(patron_punto, lambda m: '. ' + m.group(1).upper(), texto)
+    # Capitalizar después de punto, punto y coma o dos puntos seguidos de espacio (una sola pasada)
+    texto = _capitalizar_oraciones(texto)
     
-    # Capitalizar después de punto y coma cuando inicia nueva oración
-    patron_punto_coma = r'; +([a-z])'
-    texto = re.sub(patron_punto_coma, lambda m: '; ' + m.group(1).upper(), texto)
+    return texto
+
+
+def estandarizar_textos(textos: Iterable[str]) -> List[str]:
+    """Estandariza un lote de textos.
     
-    # Capitalizar después de dos puntos cuando inicia nueva oración
-    patron_dos_puntos = r': +([a-z])'
-    texto = re.sub(patron_dos_puntos, lambda m: ': ' + m.group(1).upper(), texto)
+    Los textos repetidos (dentro del lote o de lotes anteriores) se resuelven
+    desde la caché de `estandarizar_texto`.
     
-    return texto
+    Args:
+        textos (Iterable[str]): Textos a estandarizar
+    
+    Returns:
+        List[str]: Textos estandarizados, en el mismo orden de entrada
+    """
+    return [estandarizar_texto(texto) for texto in textos]
@@ -0,0 +1,26 @@
+-- ============================================
+-- MIGRACIÓN 002: Crear tabla de caché de respuestas LLM
+-- Fecha: 2026-10-16
+-- Descripción: Respuestas de Groq indexadas por hash de las entradas del prompt
+-- ============================================
+
+-- Tabla 4: Respuestas LLM
+-- Evita repetir llamadas a Groq para combinaciones (objeto, valor, entidad, nivel) ya analizadas
+CREATE TABLE IF NOT EXISTS llm_respuestas (
+    clave TEXT PRIMARY KEY,
+    
+    -- JSON ya validado (resumen, factores, recomendaciones)
+    respuesta TEXT NOT NULL,
+    
+    -- Metadatos
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_expiracion TIMESTAMP
+);
+
+-- Índices para llm_respuestas
+CREATE INDEX IF NOT EXISTS idx_expiracion_llm ON llm_respuestas(fecha_expiracion);
+
+-- ============================================
+-- VERIFICACIÓN
+-- ============================================
+-- SELECT COUNT(*) FROM llm_respuestas;
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Exporta el modelo de embeddings a ONNX y genera su versión cuantizada int8.
+
+Uso (una sola vez, fuera del servidor):
+    pip install "optimum[onnxruntime]"
+    python exportar_onnx.py [modelo] [destino] [arquitectura]
+
+Luego configurar en .env:
+    EMBEDDING_BACKEND=onnx
+    EMBEDDING_MODEL=<destino>
+    EMBEDDING_ONNX_FILE=onnx/model_qint8_<arquitectura>.onnx
+"""
+import sys
+
+# Configuraciones de cuantización dinámica soportadas por sentence-transformers
+ARQUITECTURAS = ("avx512_vnni", "avx512", "avx2", "arm64")
+
+
+def exportar(modelo: str, destino: str, arquitectura: str) -> bool:
+    """Exporta `modelo` a ONNX en `destino` y agrega el archivo cuantizado int8."""
+    print(f"📦 Exportando {modelo} a ONNX...")
+    
+    try:
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    except ImportError as e:
+        print(f"   ❌ sentence-transformers >= 3.2 con optimum[onnxruntime] es requerido: {e}")
+        return False
+    
+    try:
+        # backend="onnx" convierte el modelo a ONNX (fp32) si el repositorio no trae uno
+        st_model = SentenceTransformer(modelo, device="cpu", backend="onnx")
+        st_model.save(destino)
+        print(f"   ✅ Modelo ONNX fp32 guardado en {destino}")
+        
+        # Cuantización dinámica de pesos a int8 -> onnx/model_qint8_<arquitectura>.onnx
+        export_dynamic_quantized_onnx_model(st_model, arquitectura, destino)
+        print(f"   ✅ Modelo int8 guardado: {destino}/onnx/model_qint8_{arquitectura}.onnx")
+    except Exception as e:
+        print(f"   ❌ Error exportando modelo: {e}")
+        return False
+    
+    print("\n📝 Variables de entorno:")
+    print("   EMBEDDING_BACKEND=onnx")
+    print(f"   EMBEDDING_MODEL={destino}")
+    print(f"   EMBEDDING_ONNX_FILE=onnx/model_qint8_{arquitectura}.onnx")
+    return True
+
+
+def main():
+    """Lee argumentos opcionales y ejecuta la exportación."""
+    modelo = sys.argv[1] if len(sys.argv) > 1 else "paraphrase-multilingual-MiniLM-L12-v2"
+    destino = sys.argv[2] if len(sys.argv) > 2 else "data/embeddings_onnx"
+    arquitectura = sys.argv[3] if len(sys.argv) > 3 else "avx2"
+    
+    if arquitectura not in ARQUITECTURAS:
+        print(f"❌ Arquitectura no soportada: {arquitectura} (opciones: {', '.join(ARQUITECTURAS)})")
+        return 1
+    
+    return 0 if exportar(modelo, destino, arquitectura) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,57 +4,38 @@ Script de verificación completa para despliegue.
 Verifica que todas las dependencias y funcionalidades principales funcionen.
 """
 
+# (módulo, distribución, obligatorio): solo se verifica que estén instalados, sin importarlos
+DEPENDENCIAS = [
+    ("fastapi", "fastapi", True),
+    ("uvicorn", "uvicorn", True),
+    ("libsql", "libsql", False),
+    ("numpy", "numpy", True),
+    ("sklearn", "scikit-learn", True),
+    ("joblib", "joblib", True),
+]
+
+# Tiempo máximo por prueba (cada una corre en su propio proceso)
+TIMEOUT_PRUEBA = 300
+
 def test_imports():
-    """Prueba todas las importaciones críticas."""
-    print("🧪 Verificando importaciones...")
+    """Prueba que las dependencias críticas estén instaladas."""
+    import importlib.util
+    from importlib.metadata import PackageNotFoundError, version
     
-    try:
-        import fastapi
-        print(f"   ✅ fastapi {fastapi.__version__}")
-    except ImportError as e:
-        print(f"   ❌ fastapi: {e}")
-        return False
-    
-    try:
-        import uvicorn
-        print(f"   ✅ uvicorn {uvicorn.__version__}")
-    except ImportError as e:
-        print(f"   ❌ uvicorn: {e}")
-        return False
-    
-    try:
-        import libsql
-        print(f"   ✅ libsql disponible")
-    except ImportError as e:
-        print(f"   ⚠️ libsql no disponible (caché deshabilitado): {e}")
-    
-    try:
-        import numpy
-        print(f"   ✅ numpy {numpy.__version__}")
-    except ImportError as e:
-        print(f"   ❌ numpy: {e}")
-        return False
-    
-    try:
-        import pandas
-        print(f"   ✅ pandas {pandas.__version__}")
-    except ImportError as e:
-        print(f"   ❌ pandas: {e}")
-        return False
-    
-    try:
-        import sklearn
-        print(f"   ✅ scikit-learn {sklearn.__version__}")
-    except ImportError as e:
-        print(f"   ❌ scikit-learn: {e}")
-        return False
+    print("🧪 Verificando importaciones...")
     
-    try:
-        import joblib
-        print(f"   ✅ joblib {joblib.__version__}")
-    except ImportError as e:
-        print(f"   ❌ joblib: {e}")
-        return False
+    for modulo, distribucion, obligatorio in DEPENDENCIAS:
+        if importlib.util.find_spec(modulo) is None:
+            if obligatorio:
+                print(f"   ❌ {distribucion}: módulo '{modulo}' no encontrado")
+                return False
+            print(f"   ⚠️ {distribucion} no disponible (caché deshabilitado)")
+            continue
+        
+        try:
+            print(f"   ✅ {distribucion} {version(distribucion)}")
+        except PackageNotFoundError:
+            print(f"   ✅ {distribucion} disponible")
     
     return True
 
@@ -153,6 +134,9 @@ def test_degraded_mode():
     print("\n🔄 Verificando modo degradado...")
     
     try:
+        import os
+        # Solo se prueba la ruta ML: sin cargar el modelo de embeddings (~400MB)
+        os.environ["ENABLE_EMBEDDINGS"] = "false"
         from app.core.analyzer import RadarColInferencia
         
         # Probar con ruta inexistente para activar modo degradado
@@ -186,27 +170,92 @@ def test_degraded_mode():
         print(f"   ❌ Error en modo degradado: {e}")
         return False
 
+def test_batch_rows():
+    """Prueba que una fila inválida no altere el score de las demás filas del lote."""
+    print("\n🧮 Verificando aislamiento de filas en lotes...")
+    
+    try:
+        import os
+        os.environ["ENABLE_EMBEDDINGS"] = "false"
+        from app.config import RUTA_ARTEFACTOS
+        from app.core.analyzer import RadarColInferencia
+        
+        motor = RadarColInferencia(ruta_artefactos=RUTA_ARTEFACTOS)
+        if motor.modo_solo_llm:
+            print("   ⚠️ Artefactos no disponibles, prueba omitida")
+            return True
+        
+        contrato_valido = {
+            "Valor del Contrato": 1000000,
+            "Objeto del Contrato": "Servicio de prueba",
+            "Nit Entidad": "12345678",
+            "Duracion Dias": 30,
+            "Anio Firma": 2024,
+            "Mes Firma": 6
+        }
+        contrato_invalido = dict(contrato_valido, **{"Duracion Dias": float("nan")})
+        
+        solo = motor.analizar_lote([contrato_valido])[0]
+        lote = motor.analizar_lote([contrato_valido, contrato_invalido])
+        
+        if lote[0]["Meta_Data"] == solo["Meta_Data"] and lote[0]["Detalle_SHAP"] == solo["Detalle_SHAP"]:
+            print("   ✅ La fila válida conserva su score junto a una fila con NaN")
+            return True
+        print(f"   ❌ Score distinto en lote: {lote[0]['Meta_Data']} vs {solo['Meta_Data']}")
+        return False
+    
+    except Exception as e:
+        print(f"   ❌ Error en análisis por lotes: {e}")
+        return False
+
+PRUEBAS = [
+    ("Importaciones", test_imports),
+    ("Aplicación FastAPI", test_app),
+    ("Servicios", test_services),
+    ("Artefactos ML", test_artifacts),
+    ("Modo degradado", test_degraded_mode),
+    ("Lotes con filas inválidas", test_batch_rows),
+]
+
+def ejecutar_prueba(indice):
+    """Ejecuta una sola prueba (modo worker); el código de salida indica el resultado."""
+    test_name, test_func = PRUEBAS[indice]
+    try:
+        return 0 if test_func() else 1
+    except Exception as e:
+        print(f"\n❌ Error en {test_name}: {e}")
+        return 1
+
 def main():
-    """Ejecuta todas las pruebas."""
+    """Ejecuta todas las pruebas en paralelo, cada una en un proceso independiente.
+    
+    Así una prueba no paga las importaciones pesadas de otra y el tiempo total
+    es el de la prueba más lenta. La salida se muestra en el orden original.
+    """
+    import subprocess
+    import sys
+    
     print("🔍 VERIFICACIÓN COMPLETA PARA DESPLIEGUE")
     print("=" * 50)
     
-    tests = [
-        ("Importaciones", test_imports),
-        ("Aplicación FastAPI", test_app),
-        ("Servicios", test_services),
-        ("Artefactos ML", test_artifacts),
-        ("Modo degradado", test_degraded_mode),
+    procesos = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--prueba", str(indice)],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        for indice in range(len(PRUEBAS))
     ]
     
     all_passed = True
-    for test_name, test_func in tests:
+    for (test_name, _), proceso in zip(PRUEBAS, procesos):
         try:
-            result = test_func()
-            if not result:
-                all_passed = False
-        except Exception as e:
-            print(f"\n❌ Error en {test_name}: {e}")
+            salida, _ = proceso.communicate(timeout=TIMEOUT_PRUEBA)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+            salida, _ = proceso.communicate()
+            salida += f"\n❌ Error en {test_name}: tiempo agotado ({TIMEOUT_PRUEBA}s)\n"
+        print(salida, end="")
+        if proceso.returncode != 0:
             all_passed = False
     
     print("\n" + "=" * 50)
@@ -219,4 +268,6 @@ def main():
 
 if __name__ == "__main__":
     import sys
-    sys.exit(main())
\ No newline at end of file
+    if len(sys.argv) == 3 and sys.argv[1] == "--prueba":
+        sys.exit(ejecutar_prueba(int(sys.argv[2])))
+    sys.exit(main())